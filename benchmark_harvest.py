@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Usage: benchmark_harvest.py [-x scale] [-l latency] [-e error_rate] [-k error_kinds] [-w hang] [-n runs] [-i ini_file] [-- <harvest_option>...]
+
+Time harvest_hnap.py against the local CSW stand-in
+
+Options:
+    -x Synthetic copies of the sample corpus to serve, defaults to 1
+    -l Seconds the stand-in adds to every answer, defaults to 0
+    -e Share of stand-in requests that fail, defaults to 0
+    -k Comma separated failures to pick from: http500, timeout, malformed
+    -w Seconds a timeout failure hangs before answering, defaults to 60
+    -n Number of harvests to time, defaults to 3
+    -i harvester.ini to take the [processing] and [retry] sections from
+    <harvest_option>  Passed on to harvest_hnap.py, e.g. -- -c 4 --projection
+
+Prints pages per second, records per second and the harvester's peak
+memory for every run.
+"""
+
+# Every run harvests everything (-f 1900-01-01) into a scratch directory
+# holding its own config/harvester.ini, so checkpoints, watermarks and
+# caches from the runs don't touch the real ones.  Don't pass -o or
+# --resume.
+
+import ConfigParser
+import subprocess
+import tempfile
+import shutil
+import socket
+import urllib2
+import time
+import os
+import os.path
+import sys
+
+import docopt
+
+here = os.path.dirname(os.path.abspath(__file__))
+
+schema_file = 'config/Schema--GC.OGS.TBS-CommonCore-OpenMaps.csv'
+
+
+def main():
+    runs = int(arguments['-n'] or 3)
+    port = freePort()
+
+    standin_command = [
+        sys.executable, os.path.join(here, 'csw_standin.py'),
+        '-p', str(port), '-d', os.path.join(here, 'sample_data')]
+    for option in ['-x', '-l', '-e', '-k', '-w']:
+        if arguments[option]:
+            standin_command += [option, arguments[option]]
+
+    scratch = tempfile.mkdtemp(prefix='harvest-benchmark-')
+    standin = subprocess.Popen(standin_command)
+    try:
+        waitForStandIn(port, standin)
+        writeConfig(scratch, port, arguments['-i'])
+
+        print "run\tseconds\tpages\trecords\tpages/s\trecords/s\tpeak MB"
+        results = []
+        for run in range(1, runs + 1):
+            result = timeHarvest(scratch, arguments['<harvest_option>'])
+            if result is None:
+                log("Run %d: the harvest failed" % run)
+                return 1
+            results.append(result)
+            printResult(str(run), result)
+
+        # The median run, less noisy than the mean on a handful of runs
+        if runs > 1:
+            results.sort(key=lambda result: result['seconds'])
+            printResult('median', results[len(results) // 2])
+    finally:
+        standin.terminate()
+        standin.wait()
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+##################################################
+# Benchmark
+# freePort()
+# waitForStandIn(port, standin)
+# writeConfig(scratch, port, ini_file)
+# timeHarvest(scratch, harvest_options)
+# printResult(label, result)
+
+
+def freePort():
+    probe = socket.socket()
+    probe.bind(('127.0.0.1', 0))
+    port = probe.getsockname()[1]
+    probe.close()
+    return port
+
+
+# Loading and copying the corpus takes a moment at larger scales
+def waitForStandIn(port, standin):
+    while True:
+        if standin.poll() is not None:
+            raise RuntimeError("The CSW stand-in exited")
+        try:
+            urllib2.urlopen('http://127.0.0.1:%d/csw' % port, timeout=1)
+            return
+        except (urllib2.URLError, socket.error):
+            time.sleep(0.2)
+
+
+def writeConfig(scratch, port, ini_file):
+    ini_config = ConfigParser.ConfigParser()
+    if ini_file:
+        ini_config.read(ini_file)
+    for section in ini_config.sections():
+        if section not in ('processing', 'retry'):
+            ini_config.remove_section(section)
+    ini_config.add_section('csw')
+    ini_config.set('csw', 'url', '127.0.0.1:%d/csw' % port)
+    ini_config.set('csw', 'client', 'native')
+
+    os.mkdir(os.path.join(scratch, 'config'))
+    with open(os.path.join(scratch, 'config', 'harvester.ini'), 'w') as f:
+        ini_config.write(f)
+    # --projection reads the schema
+    shutil.copy(os.path.join(here, schema_file),
+                os.path.join(scratch, schema_file))
+
+
+def timeHarvest(scratch, harvest_options):
+    output_file = os.path.join(scratch, 'harvest.xml')
+    command = [
+        sys.executable, os.path.join(here, 'harvest_hnap.py'),
+        '-f', '1900-01-01T00:00:00Z', '-o', output_file] + harvest_options
+
+    started = time.time()
+    harvest = subprocess.Popen(command, cwd=scratch)
+    # wait4 gives the rusage of this harvest alone, kilobytes on Linux
+    status, usage = os.wait4(harvest.pid, 0)[1:]
+    seconds = time.time() - started
+    if status:
+        return None
+
+    with open(output_file, 'rb') as f:
+        harvested = f.read()
+    os.remove(output_file)
+
+    return {
+        'seconds': seconds,
+        'pages': harvested.count('<csw:GetRecordsResponse'),
+        'records': harvested.count('<gmd:MD_Metadata'),
+        'peak_mb': usage.ru_maxrss / 1024.0}
+
+
+def printResult(label, result):
+    print "%s\t%.2f\t%d\t%d\t%.1f\t%.1f\t%.1f" % (
+        label,
+        result['seconds'],
+        result['pages'],
+        result['records'],
+        result['pages'] / result['seconds'],
+        result['records'] / result['seconds'],
+        result['peak_mb'])
+
+
+def log(message):
+    sys.stderr.write(message + "\n")
+
+
+if __name__ == "__main__":
+    arguments = docopt.docopt(__doc__)
+    sys.exit(main())
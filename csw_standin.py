@@ -0,0 +1,371 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Usage: csw_standin.py [-p port] [-d sample_directory] [-x scale] [-l latency] [-e error_rate] [-k error_kinds] [-w hang]
+
+Serve the sample HNAP harvests as a local CSW GetRecords endpoint
+
+Options:
+    -p Port to listen on, defaults to 8000
+    -d Directory of HNAP harvests to serve, defaults to sample_data
+    -x Serve this many synthetic copies of the corpus, defaults to 1
+    -l Seconds added to every answer, defaults to 0
+    -e Share of GetRecords requests that fail, defaults to 0
+    -k Comma separated failures to pick from: http500, timeout, malformed
+    -w Seconds a timeout failure hangs before answering, defaults to 60
+"""
+
+# Stand-in for the FGP CSW so harvest_hnap.py can be load tested offline.
+# Point [csw] url at localhost:<port>/csw with client = native.
+#
+# Understands what harvest_hnap.py sends: maxRecords, startPosition,
+# resultType hits/results, the Modified range filters, the Modified SortBy,
+# the brief, summary and full element sets, csw:ElementName projections and
+# GetRecordById.  Anything else in the filter is ignored.
+
+# Serving
+import BaseHTTPServer
+import SocketServer
+import socket
+# Error injection
+import random
+import time
+# Synthetic copies
+import datetime
+import uuid
+# Compressed transfers
+import zlib
+import glob
+import os.path
+import sys
+
+import docopt
+from lxml import etree
+
+namespaces = {
+    'gmd': 'http://www.isotc211.org/2005/gmd',
+    'gco': 'http://www.isotc211.org/2005/gco',
+    'csw': 'http://www.opengis.net/cat/csw/2.0.2',
+    'ogc': 'http://www.opengis.net/ogc'}
+
+capabilities_template = """<?xml version="1.0" encoding="UTF-8"?>
+<csw:Capabilities
+    xmlns:csw="http://www.opengis.net/cat/csw/2.0.2"
+    xmlns:ows="http://www.opengis.net/ows"
+    xmlns:ogc="http://www.opengis.net/ogc"
+    xmlns:xlink="http://www.w3.org/1999/xlink"
+    version="2.0.2">
+    <ows:ServiceIdentification>
+        <ows:Title>harvester-FGP CSW stand-in</ows:Title>
+    </ows:ServiceIdentification>
+    <ows:OperationsMetadata>
+        <ows:Operation name="GetRecords">
+            <ows:DCP>
+                <ows:HTTP>
+                    <ows:Post xlink:href="http://%(host)s/csw"/>
+                </ows:HTTP>
+            </ows:DCP>
+        </ows:Operation>
+    </ows:OperationsMetadata>
+    <ogc:Filter_Capabilities>
+        <ogc:Spatial_Capabilities>
+            <ogc:GeometryOperands/>
+            <ogc:SpatialOperators/>
+        </ogc:Spatial_Capabilities>
+        <ogc:Scalar_Capabilities>
+            <ogc:LogicalOperators/>
+            <ogc:ComparisonOperators/>
+        </ogc:Scalar_Capabilities>
+        <ogc:Id_Capabilities/>
+    </ogc:Filter_Capabilities>
+</csw:Capabilities>
+"""
+
+response_template = """<?xml version="1.0" encoding="UTF-8"?>
+<csw:GetRecordsResponse xmlns:csw="http://www.opengis.net/cat/csw/2.0.2">
+  <csw:SearchStatus timestamp="%(timestamp)s" />
+  <csw:SearchResults numberOfRecordsMatched="%(matched)d" \
+numberOfRecordsReturned="%(returned)d" elementSet="%(element_set)s" \
+nextRecord="%(next_record)d">
+%(records)s
+  </csw:SearchResults>
+</csw:GetRecordsResponse>
+"""
+
+by_id_template = """<?xml version="1.0" encoding="UTF-8"?>
+<csw:GetRecordByIdResponse xmlns:csw="http://www.opengis.net/cat/csw/2.0.2">
+%s
+</csw:GetRecordByIdResponse>
+"""
+
+exception_template = """<?xml version="1.0" encoding="UTF-8"?>
+<ows:ExceptionReport
+    xmlns:ows="http://www.opengis.net/ows"
+    version="1.2.0">
+    <ows:Exception exceptionCode="%s">
+        <ows:ExceptionText>%s</ows:ExceptionText>
+    </ows:Exception>
+</ows:ExceptionReport>
+"""
+
+# What the brief and summary element sets keep of a record, roughly what
+# GeoNetwork keeps
+element_sets = {
+    'brief': ['gmd:fileIdentifier', 'gmd:hierarchyLevel'],
+    'summary': [
+        'gmd:fileIdentifier', 'gmd:language', 'gmd:characterSet',
+        'gmd:hierarchyLevel', 'gmd:dateStamp', 'gmd:metadataStandardName',
+        'gmd:metadataStandardVersion']
+}
+
+# How the filter's Modified literal is compared with a record's dateStamp
+comparisons = {
+    'PropertyIsGreaterThanOrEqualTo': lambda modified, literal:
+        modified >= literal,
+    'PropertyIsGreaterThan': lambda modified, literal: modified > literal,
+    'PropertyIsLessThanOrEqualTo': lambda modified, literal:
+        modified <= literal,
+    'PropertyIsLessThan': lambda modified, literal: modified < literal}
+
+
+def main():
+    port = int(arguments['-p'] or 8000)
+    sample_directory = arguments['-d'] or 'sample_data'
+    scale = int(arguments['-x'] or 1)
+
+    records = loadRecords(sample_directory, scale)
+    log("Serving %d records on port %d" % (len(records), port))
+
+    server = StandInServer(('127.0.0.1', port), StandInHandler)
+    server.records = records
+    server.latency = float(arguments['-l'] or 0)
+    server.error_rate = float(arguments['-e'] or 0)
+    server.error_kinds = (
+        arguments['-k'] or 'http500,timeout,malformed').split(',')
+    server.hang = float(arguments['-w'] or 60)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+##################################################
+# Corpus
+# loadRecords(sample_directory, scale)
+# syntheticCopy(record, copy)
+# modifiedKey(date_text)
+
+
+# Every MD_Metadata in the harvests, one per fileIdentifier (the most recent
+# harvest wins), as (Modified, fileIdentifier, serialised record) sorted the
+# way the CSW lists them
+def loadRecords(sample_directory, scale):
+    records = {}
+    for harvest_file in sorted(
+            glob.glob(os.path.join(sample_directory, '*.xml'))):
+        for record in etree.parse(harvest_file).xpath(
+                '//gmd:MD_Metadata', namespaces=namespaces):
+            identifier = record.xpath(
+                'gmd:fileIdentifier/gco:CharacterString/text()',
+                namespaces=namespaces)
+            if not identifier:
+                continue
+            records[identifier[0].strip()] = record
+
+    corpus = []
+    for copy in range(scale):
+        for record in records.values():
+            if copy:
+                record = syntheticCopy(record, copy)
+            identifier = record.xpath(
+                'gmd:fileIdentifier/gco:CharacterString/text()',
+                namespaces=namespaces)[0].strip()
+            date_stamp = record.xpath(
+                'gmd:dateStamp/*/text()', namespaces=namespaces)
+            corpus.append((
+                modifiedKey(date_stamp[0] if date_stamp else ''),
+                identifier,
+                etree.tostring(record)))
+    corpus.sort()
+    return corpus
+
+
+# The record under a new fileIdentifier, dated a week earlier per copy so
+# the scaled up corpus spreads over a wider Modified range
+def syntheticCopy(record, copy):
+    record = etree.fromstring(etree.tostring(record))
+    for identifier in record.xpath(
+            'gmd:fileIdentifier/gco:CharacterString', namespaces=namespaces):
+        identifier.text = str(uuid.uuid5(
+            uuid.NAMESPACE_URL, "%s#%d" % (identifier.text.strip(), copy)))
+    for date_stamp in record.xpath(
+            'gmd:dateStamp/*', namespaces=namespaces):
+        modified = datetime.datetime.strptime(
+            modifiedKey(date_stamp.text), '%Y-%m-%dT%H:%M:%S')
+        modified -= datetime.timedelta(weeks=copy)
+        if len(date_stamp.text.strip()) == 10:
+            date_stamp.text = modified.strftime('%Y-%m-%d')
+        else:
+            date_stamp.text = modified.strftime('%Y-%m-%dT%H:%M:%S')
+    return record
+
+
+# Dates and date times compare as date times, time zones are dropped
+def modifiedKey(date_text):
+    date_text = date_text.strip().rstrip('Z')[:19]
+    if len(date_text) == 10:
+        date_text += 'T00:00:00'
+    return date_text
+
+
+##################################################
+# GetRecords
+# StandInServer
+# StandInHandler
+# getRecords(records, request)
+# getRecordById(records, get_record_by_id)
+# project(record, element_names)
+
+
+class StandInServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def handle_error(self, request, client_address):
+        # Harvesters hang up on injected timeouts, that's expected
+        if isinstance(sys.exc_info()[1], socket.error):
+            return
+        BaseHTTPServer.HTTPServer.handle_error(self, request, client_address)
+
+
+class StandInHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    # Keep-alive, like the production CSW
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.answer(200, capabilities_template % {
+            'host': self.headers.get('Host') or '127.0.0.1'})
+
+    def do_POST(self):
+        request = self.rfile.read(int(self.headers['Content-Length']))
+        time.sleep(self.server.latency)
+
+        if random.random() < self.server.error_rate:
+            failure = random.choice(self.server.error_kinds)
+            if failure == 'http500':
+                self.answer(500, exception_template % (
+                    'NoApplicableCode', 'Injected failure'))
+                return
+            if failure == 'timeout':
+                time.sleep(self.server.hang)
+            response = getRecords(self.server.records, request)
+            if failure == 'malformed':
+                response = response[:len(response) // 2]
+            self.answer(200, response)
+            return
+
+        self.answer(200, getRecords(self.server.records, request))
+
+    def answer(self, status, body):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/xml; charset=UTF-8')
+        if 'gzip' in (self.headers.get('Accept-Encoding') or ''):
+            compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            body = compressor.compress(body) + compressor.flush()
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def getRecords(records, request):
+    try:
+        get_records = etree.fromstring(request)
+    except etree.XMLSyntaxError:
+        return exception_template % (
+            'InvalidRequest', 'GetRecords is not XML')
+
+    if etree.QName(get_records).localname == 'GetRecordById':
+        return getRecordById(records, get_records)
+
+    max_records = int(get_records.get('maxRecords', 10))
+    start_position = int(get_records.get('startPosition', 1))
+
+    matched = records
+    for comparison in get_records.xpath(
+            '//ogc:*[ogc:PropertyName = "Modified"]',
+            namespaces=namespaces):
+        # SortProperty names Modified too
+        compare = comparisons.get(etree.QName(comparison).localname)
+        if compare is None:
+            continue
+        literal = modifiedKey(comparison.findtext(
+            '{http://www.opengis.net/ogc}Literal'))
+        matched = [
+            record for record in matched if compare(record[0], literal)]
+
+    # Sorted on Modified already, the SortBy needs nothing more
+    if get_records.get('resultType') == 'hits':
+        page = []
+    else:
+        page = matched[start_position - 1:start_position - 1 + max_records]
+    next_record = start_position + len(page)
+    if next_record > len(matched):
+        next_record = 0
+
+    element_set = (get_records.findtext(
+        '{http://www.opengis.net/cat/csw/2.0.2}Query/'
+        '{http://www.opengis.net/cat/csw/2.0.2}ElementSetName') or
+        'full').strip()
+    element_names = [
+        element_name.text.strip() for element_name in get_records.xpath(
+            '//csw:ElementName', namespaces=namespaces)]
+    page = [record[2] for record in page]
+    if element_names:
+        element_set = 'brief'
+        page = [project(record, element_names) for record in page]
+    elif element_set in element_sets:
+        page = [
+            project(record, element_sets[element_set]) for record in page]
+
+    return response_template % {
+        'timestamp': datetime.datetime.utcnow().strftime(
+            '%Y-%m-%dT%H:%M:%S'),
+        'matched': len(matched),
+        'returned': len(page),
+        'element_set': element_set,
+        'next_record': next_record,
+        'records': '\n'.join(page)}
+
+
+def getRecordById(records, get_record_by_id):
+    identifiers = [
+        identifier.text.strip() for identifier in get_record_by_id.xpath(
+            'csw:Id', namespaces=namespaces)]
+    found = dict([
+        (record[1], record[2]) for record in records
+        if record[1] in identifiers])
+    return by_id_template % '\n'.join([
+        found[identifier] for identifier in identifiers
+        if identifier in found])
+
+
+# Only the top level elements asked for (gmd:name), as harvest_hnap.py asks
+def project(record, element_names):
+    record = etree.fromstring(record)
+    for child in list(record):
+        if not isinstance(child.tag, basestring) or\
+                'gmd:' + etree.QName(child).localname not in element_names:
+            record.remove(child)
+    return etree.tostring(record)
+
+
+def log(message):
+    sys.stderr.write(message + "\n")
+
+
+if __name__ == "__main__":
+    arguments = docopt.docopt(__doc__)
+    sys.exit(main())
@@ -2,21 +2,19 @@
 #!/bin/bash
 
 # Lockfile
-# 86400 — one day
-# 10800 - three hours
+# An flock on run.lock, held until this script exits however it exits, so
+# there is no stale lock to age out.  harvest_hnap.py --daemon takes the
+# same lock, cron and the daemon never overlap.
 
 # Jump into the Open Maps harvester directory
 # cd /home/odatsrv/_harvester_OpenMaps
 
-if [ -e "run.lock" ]; then
-    if [ "$(( $(date +"%s") - $(stat -c "%Y" run.lock) ))" -lt "10800" ]; then
-        echo "Aborting: Lock file 'run.lock' found"
-        exit 0
-    fi
+exec 9>>run.lock
+if ! flock -n 9; then
+    echo "Aborting: Lock file 'run.lock' is held by another harvest"
+    exit 0
 fi
 
-date +"%Y-%m-%dT%H:%M:%SZ" > run.lock
-
 # Need to enable python27
 # /usr/bin/scl enable python27
 
@@ -32,6 +30,8 @@ OGS_HARVEST_LAST_RUN=$(cat run.last)
 
 # Now updating run.last after successful CKAN load
 # date +"%Y-%m-%dT%H:%M:%SZ" > run.last
+# The harvester leaves the CSW's own timestamp in run.next, that becomes
+# run.last once the load succeeds
 
 echo "Run starting from:"
 echo $OGS_HARVEST_LAST_RUN
@@ -39,20 +39,27 @@ echo $OGS_HARVEST_LAST_RUN
 # AND THEN the virtual environment
 # . /var/www/html/venv/staging-portal/bin/activate
 
+# Pick up an interrupted harvest instead of starting over
+OGS_HARVEST_RESUME=""
+if [ -e "harvest.checkpoint" ]; then
+    echo "Resuming the interrupted harvest"
+    OGS_HARVEST_RESUME="--resume"
+fi
+
+# --changed lists identifiers first and only fetches records that are new
+# or changed since harvest.index, it can't resume an interrupted harvest
+# OGS_HARVEST_CHANGED="--changed"
+
 # Collect the latest data
 # /home/odatsrv/_harvester_OpenMaps/harvest_hnap.py -f $OGS_HARVEST_LAST_RUN > harvested_records.xml
-./harvest_hnap.py -f $OGS_HARVEST_LAST_RUN > harvested_records.xml & pid=$!
-
-# Show progress as this can take several minutes
-spin='-\|/'
-i=0
-while kill -0 $pid 2>/dev/null
-do
-  i=$(( (i+1) %4 ))
-  printf "\r${spin:$i:1}"
-  sleep .1
-done
-printf "\r"
+# Progress and an ETA are reported on stderr as this can take several minutes
+./harvest_hnap.py -f $OGS_HARVEST_LAST_RUN -o harvested_records.xml -p $OGS_HARVEST_RESUME $OGS_HARVEST_CHANGED
+
+# A harvest that didn't finish keeps its checkpoint for the next cycle
+if [ $? -ne 0 ]; then
+    echo "Harvest interrupted, will resume on the next run"
+    exit 1
+fi
 
 # Create the common core JSON file
 /bin/cat harvested_records.xml | ./hnap2cc-json.py
@@ -71,13 +78,29 @@ else
     # ckanapi load datasets -I ~/_harvester_OpenMaps/harvested_records.jl -c production.ini
 
     # STAGING
-    # ckanapi load datasets -I harvested_records.jl -r http://staging.open.canada.ca/data -a CKAN_API_KEY && date +"%Y-%m-%dT%H:%M:%SZ" > run.last
+    # ckanapi load datasets -I harvested_records.jl -r http://staging.open.canada.ca/data -a CKAN_API_KEY && mv run.next run.last && { [ ! -e harvest.index.next ] || mv harvest.index.next harvest.index; }
 
     # PRODUCTION
-    # ckanapi load datasets -I harvested_records.jl -r http://open.canada.ca/data -a CKAN_API_KEY && date +"%Y-%m-%dT%H:%M:%SZ" > run.last
+    # ckanapi load datasets -I harvested_records.jl -r http://open.canada.ca/data -a CKAN_API_KEY && mv run.next run.last && { [ ! -e harvest.index.next ] || mv harvest.index.next harvest.index; }
 
     # LOCAL TESTING
     # to test: ckanapi load datasets -I test_upload.jl -r http://staging.open.canada.ca/data -a CKAN_API_KEY
 fi
 
-rm run.lock
\ No newline at end of file
+# Several catalogues, [csw] and every [csw:name] in config/harvester.ini.
+# Each source carries on from its own run.<name>.last, so each one's
+# run.<name>.next (and harvest.<name>.index.next) is moved into place once
+# its own records are loaded, a source that fails to load harvests again
+# from the same watermark.
+promote_source() {
+    mv "run.$1.next" "run.$1.last" &&
+        { [ ! -e "harvest.$1.index.next" ] ||
+            mv "harvest.$1.index.next" "harvest.$1.index"; }
+}
+# ./harvest_hnap.py --sources -o harvested_records.xml -p $OGS_HARVEST_RESUME $OGS_HARVEST_CHANGED
+# for source in nrcan ec; do
+#     ./hnap2cc-json.py harvested_records.$source.xml && ckanapi load datasets -I harvested_records.jl -r http://open.canada.ca/data -a CKAN_API_KEY && promote_source $source
+# done
+
+# Records removed from FGP, a full identifier sweep, weekly is plenty
+# ./harvest_hnap.py --reconcile -s 8 -c 4 && ckanapi delete datasets -I harvested_deletions.jl -r http://open.canada.ca/data -a CKAN_API_KEY
@@ -1,16 +1,27 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
-"""Usage: hnap2cc-json.py [-e Error file to generate]
+"""Usage: hnap2cc-json.py [-e Error file to generate] [--compact [--verify]] [--workers N] [<hnap_file>]
 
 Convert HNAP 2.3.1 XML from FGP platform CSW v1.6.2 to OGP Portal input
 
-Accepts streamed HNAP xml input or a supplied HNAP xml filename
+Accepts streamed HNAP xml input or a supplied HNAP xml filename, either
+may be gzip (.xml.gz) or zstd (.xml.zst) compressed, or the spool
+directory of a harvest.  Either whole CSW responses or XML Lines, a
+gmd:MD_Metadata per line (harvest_hnap.py --xml-lines)
 
     cat hnap.xml | hnap2cc-json.py [-e Error file to generate]
     hnap2cc-json.py [-e Error file to generate] hnap.xml
+    hnap2cc-json.py [-e Error file to generate] hnap.xml.gz
+    hnap2cc-json.py [-e Error file to generate] spool/
 
 Options:
     -e Error file to generate
+    --compact  Only convert the last version of every fileIdentifier, for
+               replays of many harvests
+    --verify  Convert everything as well and check the records loaded would
+              be the same, exits 1 when they aren't
+    --workers N  Convert on N processes, the records still come out in the
+                 order they went in
 """
 
 ##################################################
@@ -24,10 +35,28 @@ import json
 import datetime
 
 import sys
-from io import StringIO, BytesIO
+from io import StringIO
 import time
 import re
-import codecs
+# Compressed harvests
+import zlib
+# Spooled harvests
+import os.path
+import hashlib
+# Indexed plain harvests
+import mmap
+# --compact, --verify
+import copy
+import tempfile
+import shutil
+# --workers
+import multiprocessing
+import collections
+# Optional, only needed to read .zst harvests
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
 
 import unicodedata
 
@@ -38,32 +67,158 @@ MAX_TAG_LENGTH = 140
 
 ##################################################
 # TL err/dbg
+# The error rows of the record being converted, written out and cleared
+# once it's finished, and how many errors each fileIdentifier has had this
+# run, any is a reject
 error_output = []
 error_records = {}
 
 ##################################################
-# Process the command request
-
-# #Default import location
-# input_file     = 'data/majechr_source.xml'
-# input_file     = 'data/hnap_import.xml'
-input_file = None
-
-# Use stdin if it's populated
-if not sys.stdin.isatty():
-    input_file = BytesIO(sys.stdin.read())
+# Compressed input
+# openHNAPInput(stream)
+# PeekedStream
+# readChunks(stream)
+# gunzipChunks(chunks)
+# iterLines(chunks)
+
+
+# gzip and zstd are recognised by their magic bytes, anything else is
+# taken to be plain XML.  All of them are read as they come, line by line,
+# stdin can't seek back and a harvest needn't fit in memory.
+def openHNAPInput(stream):
+    magic = stream.read(4)
+    stream = PeekedStream(magic, stream)
+    if magic[:2] == '\x1f\x8b':
+        return iterLines(gunzipChunks(readChunks(stream)))
+    if magic == '\x28\xb5\x2f\xfd':
+        if zstandard is None:
+            sys.stderr.write(
+                "zstandard is needed to read .zst harvests, "
+                "pip install zstandard\n")
+            sys.exit(1)
+        # Harvests are written one zstd frame per page
+        try:
+            reader = zstandard.ZstdDecompressor().stream_reader(
+                stream, read_across_frames=True)
+        except TypeError:
+            reader = zstandard.ZstdDecompressor().stream_reader(stream)
+        return iterLines(readChunks(reader))
+    return iterLines(readChunks(stream))
+
+
+# A stream with the bytes already read off its front put back
+class PeekedStream(object):
+    def __init__(self, peeked, stream):
+        self.peeked = peeked
+        self.stream = stream
+
+    def read(self, size=-1):
+        if not self.peeked:
+            return self.stream.read(size)
+        peeked, self.peeked = self.peeked, ''
+        return peeked
+
+
+def readChunks(stream):
+    while True:
+        chunk = stream.read(64 * 1024)
+        if not chunk:
+            break
+        yield chunk
+
+
+# Harvests are written one gzip member per page, a new decompressor starts
+# on whatever the last one left over
+def gunzipChunks(chunks):
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        while chunk:
+            yield decompressor.decompress(chunk)
+            chunk = decompressor.unused_data
+            if chunk:
+                decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    yield decompressor.flush()
+
+
+def iterLines(chunks):
+    pending = ''
+    for chunk in chunks:
+        lines = (pending + chunk).split('\n')
+        pending = lines.pop()
+        for line in lines:
+            yield line + '\n'
+    if pending:
+        yield pending
 
-# Otherwise, read for a given filename
-if len(sys.argv) == 2:
-    input_file = sys.argv[1]
+##################################################
+# Process the command request
+# openInput(hnap_file)
+# openRecords(hnap_file, save_index)
+# readSpool(spool_directory)
+# streamRecords(input_lines)
+# recordParser()
+# documentRecords(parser)
+
+
+# The lines of the file given or stdin if it's populated, None when there's
+# neither.  Importing the converter (harvest_hnap.py --id) reads nothing.
+def openInput(hnap_file):
+    # #Default import location
+    # input_file     = 'data/majechr_source.xml'
+    # input_file     = 'data/hnap_import.xml'
+    input_file = None
+
+    # Read a given filename
+    if hnap_file:
+        input_file = open(hnap_file, 'rb')
+
+    # Otherwise use stdin if it's populated
+    elif not sys.stdin.isatty():
+        input_file = sys.stdin
+
+    # Either may be compressed
+    if input_file is not None:
+        input_file = openHNAPInput(input_file)
+    return input_file
+
+
+# The records of a spool directory, a file or stdin, None when there's no
+# input.  Plain files are mapped into memory and indexed rather than read
+# line by line.
+def openRecords(hnap_file, save_index=True):
+    if hnap_file and os.path.isdir(hnap_file):
+        return streamRecords(readSpool(hnap_file))
+    if hnap_file:
+        input_map = mapInput(hnap_file)
+        if input_map is not None:
+            return mappedRecords(input_map, readBlockIndex(
+                hnap_file, input_map, save_index))
+    input_file = openInput(hnap_file)
+    if input_file is None:
+        return None
+    return streamRecords(input_file)
+
+
+# The lines of every page in manifest order, the order the harvester wrote
+# them in, read the same as a single harvest file.  A page that doesn't
+# match its sha256 stops the conversion, the pages after it can't be
+# applied without it.
+def readSpool(spool_directory):
+    with open(os.path.join(spool_directory, 'manifest.jl'), 'rb') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            page = json.loads(line)
+            with open(os.path.join(spool_directory, page['file']), 'rb') as p:
+                input_block = p.read()
+            if hashlib.sha256(input_block).hexdigest() != page['sha256']:
+                sys.stderr.write(
+                    "%s doesn't match its sha256 in the manifest\n" %
+                    page['file'])
+                sys.exit(1)
+            for input_line in input_block.splitlines(True):
+                yield input_line
 
-if input_file is None:
-    sys.stdout.write("""
-Either stream HNAP in or supply a file
-> cat hnap.xml | ./hnap2json.py
-> ./hnap2json.py hnap.xml
-""")
-    sys.exit()
 
 ##################################################
 # Input can be multiple XML blocks
@@ -76,22 +231,263 @@ Either stream HNAP in or supply a file
 # subsequent records.  You can't re-process data
 # from a particular span of time, any historical
 # re-procssing must continue to the current day.
-input_data_blocks = []
-active_input_block = ''
-for line in input_file:
-    if not line.strip():
-        continue
-    if active_input_block == '':
-        active_input_block += line
-    elif re.search(r'^<\?xml', line):
-        input_data_blocks.append(active_input_block)
-        active_input_block = line
-    else:
-        active_input_block += line
-input_data_blocks.append(active_input_block)
+#
+# Every gmd:MD_Metadata as (block, record), a block being a response (a
+# new one starts at every <?xml) or an XML Lines record outside of one.
+# Records are parsed as their block streams in and cleared, with what came
+# before them, once the next is asked for, so only a record's worth of XML
+# is held at a time.
+def streamRecords(input_lines):
+    block = 0
+    parser = None
+    pending = []
+    pending_size = 0
+    for line in input_lines:
+        if not line.strip():
+            continue
+        if parser is None and line.startswith('<gmd:MD_Metadata'):
+            block += 1
+            yield block, xmlLinesRecord(line)
+            continue
+        if parser is not None and line.startswith('<?xml'):
+            parser.feed(''.join(pending))
+            pending = []
+            pending_size = 0
+            parser.close()
+            for record in documentRecords(parser):
+                yield block, record
+            parser = None
+        if parser is None:
+            block += 1
+            parser = recordParser()
+        # Fed a chunk at a time, lxml is slow a line at a time
+        pending.append(line)
+        pending_size += len(line)
+        if pending_size >= 64 * 1024:
+            parser.feed(''.join(pending))
+            pending = []
+            pending_size = 0
+            for record in documentRecords(parser):
+                yield block, record
+    if parser is not None:
+        parser.feed(''.join(pending))
+        parser.close()
+        for record in documentRecords(parser):
+            yield block, record
+
+
+# Hands over every gmd:MD_Metadata as it ends
+def recordParser():
+    return etree.XMLPullParser(
+        events=('end',),
+        tag='{http://www.isotc211.org/2005/gmd}MD_Metadata')
+
+
+# The records parsed so far, the ones records_root would find: a response's
+# SearchResults or a document that is a record
+def documentRecords(parser):
+    for event, record in parser.read_events():
+        parent = record.getparent()
+        if parent is None:
+            yield record
+            continue
+        if parent.tag != '{http://www.opengis.net/cat/csw/2.0.2}SearchResults':
+            continue
+        root = parent.getparent()
+        if root is None or root.getparent() is not None or root.tag !=\
+                '{http://www.opengis.net/cat/csw/2.0.2}GetRecordsResponse':
+            continue
+        yield record
+        record.clear()
+        while record.getprevious() is not None:
+            del parent[0]
+
+##################################################
+# Memory mapped input
+# mapInput(hnap_file)
+# readBlockIndex(hnap_file, input_map, save_index)
+# indexBlocks(input_map)
+# mappedRecords(input_map, blocks)
+# xmlLinesRecord(line)
+# blockChunks(input_map, offset, length)
+
+# Lines streamRecords skips, and where it starts a new response.  Led by
+# a newline rather than ^, the regular expressions only try at line ends.
+blank_line = re.compile(r'[ \t\r\x0b\x0c]*(?:\n|\Z)')
+blank_lines = re.compile(r'\n[ \t\r\x0b\x0c]*(?=\n|\Z)')
+xml_declaration = re.compile(r'\n<\?xml')
+# A blank line in an XML Lines record, its newlines written as &#10;
+xml_lines_blank_line = re.compile(r'&#10;(?:[ \t]|&#13;)*(?=&#10;)')
+
+
+# A plain harvest file mapped into memory, None when it's compressed,
+# empty or not a file and has to be streamed
+def mapInput(hnap_file):
+    if not os.path.isfile(hnap_file):
+        return None
+    with open(hnap_file, 'rb') as f:
+        magic = f.read(4)
+        if not magic or magic[:2] == '\x1f\x8b' or\
+                magic == '\x28\xb5\x2f\xfd':
+            return None
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+# The blocks of a file as (offset, length), from the index saved next to
+# it (hnap.xml.idx) unless the file's size or time has changed since.  A
+# JSON line for the file then one per block.
+def readBlockIndex(hnap_file, input_map, save_index=True):
+    index_file = hnap_file + '.idx'
+    status = os.stat(hnap_file)
+    indexed = {'size': status.st_size, 'mtime': status.st_mtime}
+    try:
+        with open(index_file, 'rb') as f:
+            if json.loads(f.readline()) == indexed:
+                return [tuple(json.loads(line)) for line in f]
+    except (IOError, ValueError):
+        pass
+
+    blocks = indexBlocks(input_map)
+    if not save_index:
+        return blocks
+    try:
+        with open(index_file + '.tmp', 'wb') as f:
+            f.write(json.dumps(indexed) + "\n")
+            for block in blocks:
+                f.write(json.dumps(block) + "\n")
+        os.rename(index_file + '.tmp', index_file)
+    except (IOError, OSError) as e:
+        sys.stderr.write("Couldn't save %s: %s\n" % (index_file, e))
+    return blocks
+
+
+# One pass over the map finding the blocks streamRecords would: XML Lines
+# records until the first response, then a response at every <?xml.  Only
+# the XML Lines are looked at line by line, the responses are a regular
+# expression over the map.
+def indexBlocks(input_map):
+    blocks = []
+    offset = 0
+    size = len(input_map)
+    while offset < size:
+        end = input_map.find('\n', offset) + 1 or size
+        if blank_line.match(input_map, offset):
+            offset = end
+            continue
+        if input_map[offset:offset + 16] != '<gmd:MD_Metadata':
+            break
+        blocks.append((offset, end - offset))
+        offset = end
+
+    if offset < size:
+        starts = [offset] + [
+            declaration.start() + 1 for declaration in
+            xml_declaration.finditer(input_map, offset)]
+        for start, next_start in zip(starts, starts[1:] + [size]):
+            blocks.append((start, next_start - start))
+    return blocks
+
+
+# The records of the blocks given, numbered in order, the same as
+# streamRecords gives for the file
+def mappedRecords(input_map, blocks):
+    for block, (offset, length) in enumerate(blocks, 1):
+        if input_map[offset:offset + 16] == '<gmd:MD_Metadata':
+            yield block, xmlLinesRecord(input_map[offset:offset + length])
+            continue
+        parser = recordParser()
+        for chunk in blockChunks(input_map, offset, length):
+            parser.feed(chunk)
+            for record in documentRecords(parser):
+                yield block, record
+        parser.close()
+        for record in documentRecords(parser):
+            yield block, record
+
+
+# An XML Lines record parsed with the blank lines in its text dropped, as
+# streamRecords drops them from responses, so a record converts the same
+# from the journal, --replay or --xml-lines as from a whole response
+def xmlLinesRecord(line):
+    return etree.XML(xml_lines_blank_line.sub('', line))
+
+
+# A block sliced off the map just before a newline, so every blank line
+# has the newline ahead of it in the same chunk and is dropped as
+# streamRecords drops them.  Blocks start on a line that isn't blank.
+def blockChunks(input_map, offset, length):
+    block_end = offset + length
+    while offset < block_end:
+        end = input_map.find('\n', offset + 64 * 1024, block_end)
+        if end < 0:
+            end = block_end
+        yield blank_lines.sub('', input_map[offset:end])
+        offset = end
 
 ##################################################
 # Extract the schema to convert to
+# FieldSpec
+
+xpath_namespaces = {
+    'gmd': 'http://www.isotc211.org/2005/gmd',
+    'gco': 'http://www.isotc211.org/2005/gco',
+    'gml': 'http://www.opengis.net/gml/3.2',
+    'csw': 'http://www.opengis.net/cat/csw/2.0.2'}
+
+
+# A row of the schema.  Read and written by column name as the rows always
+# have been, schema_ref["05"]['CKAN API property'].  xpath is the row's FGP
+# XPATH compiled once here, with /@codeListValue for attribute rows, so
+# every record only runs it.  None for rows that aren't looked up in the
+# XML.
+class FieldSpec(object):
+    __slots__ = (
+        'property_id', 'ckan_api_property', 'name_english', 'name_french',
+        'requirement', 'occurrences', 'reference', 'value_type',
+        'fgp_xpath', 'regex_filter', 'xpath')
+
+    columns = {
+        'Property ID': 'property_id',
+        'CKAN API property': 'ckan_api_property',
+        'Schema Name English': 'name_english',
+        'Schema Name French': 'name_french',
+        'Requirement': 'requirement',
+        'Occurrences': 'occurrences',
+        'Reference': 'reference',
+        'Value Type': 'value_type',
+        'FGP XPATH': 'fgp_xpath',
+        'RegEx Filter': 'regex_filter'}
+
+    def __init__(self, row):
+        self.property_id = row[0]
+        self.ckan_api_property = row[1]
+        self.name_english = unicode(row[2], 'utf-8')
+        self.name_french = unicode(row[3], 'utf-8')
+        self.requirement = row[4]
+        self.occurrences = row[5]
+        self.reference = row[6]
+        self.value_type = row[7]
+        self.fgp_xpath = unicode(row[8], 'utf-8')
+        self.regex_filter = unicode(row[9], 'utf-8')
+
+        # Excluded, fixed and CKAN provided rows hold notes and values
+        self.xpath = None
+        if self.value_type == 'attribute':
+            self.xpath = etree.XPath(
+                self.fgp_xpath + '/@codeListValue',
+                namespaces=xpath_namespaces)
+        elif self.value_type in ('value', 'manual', '') and self.fgp_xpath:
+            self.xpath = etree.XPath(
+                self.fgp_xpath, namespaces=xpath_namespaces)
+
+    def __getitem__(self, column):
+        return getattr(self, self.columns[column])
+
+    # The conversion overrides Occurrences for a few rows
+    def __setitem__(self, column, value):
+        setattr(self, self.columns[column], value)
+
+
 schema_file = 'config/Schema--GC.OGS.TBS-CommonCore-OpenMaps.csv'
 schema_ref = {}
 with open(schema_file, 'rb') as f:
@@ -99,17 +495,7 @@ with open(schema_file, 'rb') as f:
     for row in reader:
         if row[0] == 'Property ID':
             continue
-        schema_ref[row[0]] = {}
-        schema_ref[row[0]]['Property ID'] = row[0]
-        schema_ref[row[0]]['CKAN API property'] = row[1]
-        schema_ref[row[0]]['Schema Name English'] = unicode(row[2], 'utf-8')
-        schema_ref[row[0]]['Schema Name French'] = unicode(row[3], 'utf-8')
-        schema_ref[row[0]]['Requirement'] = row[4]
-        schema_ref[row[0]]['Occurrences'] = row[5]
-        schema_ref[row[0]]['Reference'] = row[6]
-        schema_ref[row[0]]['Value Type'] = row[7]
-        schema_ref[row[0]]['FGP XPATH'] = unicode(row[8], 'utf-8')
-        schema_ref[row[0]]['RegEx Filter'] = unicode(row[9], 'utf-8')
+        schema_ref[row[0]] = FieldSpec(row)
 
 
 records_root = ("/csw:GetRecordsResponse/"
@@ -142,26 +528,82 @@ iso_time = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime())
 def main():
     output_jl = "harvested_records.jl"
     output_err = "harvested_record_errors.csv"
-    num_rejects = 0
-    num_view_on_map = 0
 
     # Is there a specified start date
     if arguments['-e']:
         output_err = arguments['-e']
 
-    json_records = []
-    for input_block in input_data_blocks:
+    hnap_file = arguments['<hnap_file>']
+    stdin_copy = None
+    # --verify reads the input twice, stdin only streams in once
+    if arguments['--verify'] and not hnap_file and not sys.stdin.isatty():
+        stdin_copy = tempfile.NamedTemporaryFile(suffix='.xml')
+        shutil.copyfileobj(sys.stdin, stdin_copy)
+        stdin_copy.flush()
+        hnap_file = stdin_copy.name
+
+    # Nothing to index for next time in a temporary copy
+    records = openRecords(hnap_file, stdin_copy is None)
+    if records is None:
+        sys.stdout.write("""
+Either stream HNAP in or supply a file
+> cat hnap.xml | ./hnap2json.py
+> ./hnap2json.py hnap.xml
+""")
+        sys.exit()
 
-        # Read the file, should be a streamed input in the future
-        root = etree.XML(input_block)
-        # Parse the root and itterate over each record
-        records = fetchXMLArray(root, records_root)
+    if arguments['--compact']:
+        records = compactRecords(records)
+    workers = int(arguments['--workers'] or 0)
+    # Written as each record is finished, renamed into place once all are
+    output = ConversionOutput(output_jl, output_err, arguments['--verify'])
+    try:
+        num_accepted, num_rejects, num_view_on_map = convertRecords(
+            records, output, workers=workers)
+
+        mismatches = []
+        if arguments['--verify']:
+            mismatches = verifyCompaction(
+                output.loaded,
+                openRecords(hnap_file, stdin_copy is None), workers)
+    except:
+        output.discard()
+        raise
+    output.close()
+
+    if num_accepted > 0:
+        print ""
+        print "* Number of records accepted: "+str(num_accepted)
+        print ""
+        print "* Number of records rejected: "+str(num_rejects)
+        print ""
+        print "* Number with view on map:    "+str(num_view_on_map)
+        print ""
+        print "* Number of errors logged:    "+str(output.num_errors) + " [ harvested_record_errors.csv | harvested_record_errors.html ]"
+        print ""
+
+    if mismatches:
+        for mismatch in mismatches:
+            sys.stderr.write(mismatch + "\n")
+        sys.exit(1)
+
+##################################################
+# Record conversion
+# convertRecord(record)
+# convertRecords(records, output, quiet, workers)
+# convertRecordLine(record)
+# markAccepted(json_record)
+# jsonLine(json_record)
 
-        for record in records:
-            json_record = {}
 
-            can_be_used_in_RAMP = False
-            json_record['display_flags'] = []
+# One gmd:MD_Metadata to a Common Core record.  Errors go through
+# reportError, a record with any is rejected by the caller.  None when
+# there's no primary language or ID to carry on with.
+def convertRecord(record):
+    json_record = {}
+
+    can_be_used_in_RAMP = False
+    json_record['display_flags'] = []
 
 ##################################################
 # HNAP CORE LANGUAGE
@@ -169,50 +611,50 @@ def main():
 # Language is required, the rest can't be processed
 # for errors if the primary language is not certain
 
-            tmp = fetchXMLValues(record, schema_ref["12"]['FGP XPATH'])
-            if sanitySingle('NOID', ['HNAP Priamry Language'], tmp) is False:
-                HNAP_primary_language = False
-            else:
-                HNAP_primary_language = sanityFirst(tmp).split(';')[0].strip()
-                if HNAP_primary_language == 'eng':
-                    CKAN_primary_lang = 'en'
-                    CKAN_secondary_lang = 'fr'
-                    HNAP_primary_lang = 'English'
-                    HNAP_secondary_lang = 'French'
-                else:
-                    CKAN_primary_lang = 'fr'
-                    CKAN_secondary_lang = 'en'
-                    HNAP_primary_lang = 'French'
-                    HNAP_secondary_lang = 'English'
+    tmp = fetchXMLValues(record, schema_ref["12"].xpath)
+    if sanitySingle('NOID', ['HNAP Priamry Language'], tmp) is False:
+        HNAP_primary_language = False
+    else:
+        HNAP_primary_language = sanityFirst(tmp).split(';')[0].strip()
+        if HNAP_primary_language == 'eng':
+            CKAN_primary_lang = 'en'
+            CKAN_secondary_lang = 'fr'
+            HNAP_primary_lang = 'English'
+            HNAP_secondary_lang = 'French'
+        else:
+            CKAN_primary_lang = 'fr'
+            CKAN_secondary_lang = 'en'
+            HNAP_primary_lang = 'French'
+            HNAP_secondary_lang = 'English'
 
 ##################################################
 # Catalogue Metadata
 ##################################################
 
 # CC::OpenMaps-01 Catalogue Type
-            json_record[schema_ref["01"]['CKAN API property']] = 'dataset'
+    json_record[schema_ref["01"]['CKAN API property']] = 'dataset'
 # CC::OpenMaps-02 Collection Type
-            json_record[schema_ref["02"]['CKAN API property']] = 'fgp'
+    json_record[schema_ref["02"]['CKAN API property']] = 'fgp'
 # CC::OpenMaps-03 Metadata Scheme
 #       CKAN defined/provided
 # CC::OpenMaps-04 Metadata Scheme Version
 #       CKAN defined/provided
 # CC::OpenMaps-05 Metadata Record Identifier
-            tmp = fetchXMLValues(record, schema_ref["05"]['FGP XPATH'])
-            if sanitySingle('NOID', ['fileIdentifier'], tmp) is False:
-                HNAP_fileIdentifier = False
-            else:
-                json_record[schema_ref["05"]['CKAN API property']] =\
-                    HNAP_fileIdentifier =\
-                    sanityFirst(tmp)
+    tmp = fetchXMLValues(record, schema_ref["05"].xpath)
+    if sanitySingle('NOID', ['fileIdentifier'], tmp) is False:
+        HNAP_fileIdentifier = False
+    else:
+        json_record[schema_ref["05"]['CKAN API property']] =\
+            HNAP_fileIdentifier =\
+            sanityFirst(tmp)
 
 ##################################################
 # Point of no return
 # fail out if you don't have either a primary language or ID
 ##################################################
 
-            if HNAP_primary_language is False or HNAP_fileIdentifier is False:
-                break
+    if HNAP_primary_language is False or HNAP_fileIdentifier is False:
+        return None
 
 # From here on in continue if you can and collect as many errors as
 # possible for FGP Help desk.  We awant to have a full report of issues
@@ -221,211 +663,211 @@ def main():
 # opposed to doing them piecemeal.
 
 # CC::OpenMaps-06 Metadata Contact (English)
-            primary_vals = []
-            # organizationName
-            value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["06a"])
-            if value:
-                for single_value in value:
-                    primary_vals.append(single_value)
-            # voice
-            value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["06b"])
-            if value:
-                for single_value in value:
-                    primary_vals.append(single_value)
-            # electronicMailAddress
-            value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["06c"])
-            if value:
-                for single_value in value:
-                    primary_vals.append(single_value)
-
-            json_record[schema_ref["06"]['CKAN API property']] = {}
-            json_record[
-                schema_ref["06"]['CKAN API property']
-            ][CKAN_primary_lang] = ','.join(primary_vals)
+    primary_vals = []
+    # organizationName
+    value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["06a"])
+    if value:
+        for single_value in value:
+            primary_vals.append(single_value)
+    # voice
+    value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["06b"])
+    if value:
+        for single_value in value:
+            primary_vals.append(single_value)
+    # electronicMailAddress
+    value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["06c"])
+    if value:
+        for single_value in value:
+            primary_vals.append(single_value)
+
+    json_record[schema_ref["06"]['CKAN API property']] = {}
+    json_record[
+        schema_ref["06"]['CKAN API property']
+    ][CKAN_primary_lang] = ','.join(primary_vals)
 
 # CC::OpenMaps-07 Metadata Contact (French)
-            second_vals = []
-
-            # organizationName
-            value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["07a"])
-            if value:
-                for single_value in value:
-                    second_vals.append(single_value)
-            # voice
-            value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["07b"])
-            if value:
-                for single_value in value:
-                    primary_vals.append(single_value)
-            # electronicMailAddress
-            value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["07c"])
-            if value:
-                for single_value in value:
-                    second_vals.append(single_value)
-
-            json_record[
-                schema_ref["06"]['CKAN API property']
-            ][CKAN_secondary_lang] = ','.join(second_vals)
+    second_vals = []
+
+    # organizationName
+    value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["07a"])
+    if value:
+        for single_value in value:
+            second_vals.append(single_value)
+    # voice
+    value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["07b"])
+    if value:
+        for single_value in value:
+            primary_vals.append(single_value)
+    # electronicMailAddress
+    value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["07c"])
+    if value:
+        for single_value in value:
+            second_vals.append(single_value)
+
+    json_record[
+        schema_ref["06"]['CKAN API property']
+    ][CKAN_secondary_lang] = ','.join(second_vals)
 
 # CC::OpenMaps-08 Source Metadata Record Date Stamp
-            tmp = fetchXMLValues(record, schema_ref["08a"]['FGP XPATH'])
-            values = list(set(tmp))
-            if len(values) < 1:
-                tmp = fetchXMLValues(record, schema_ref["08b"]['FGP XPATH'])
-
-            if sanityMandatory(
-                HNAP_fileIdentifier,
-                [schema_ref["08"]['CKAN API property']],
-                tmp
-            ):
-                if sanitySingle(
+    tmp = fetchXMLValues(record, schema_ref["08a"].xpath)
+    values = list(set(tmp))
+    if len(values) < 1:
+        tmp = fetchXMLValues(record, schema_ref["08b"].xpath)
+
+    if sanityMandatory(
+        HNAP_fileIdentifier,
+        [schema_ref["08"]['CKAN API property']],
+        tmp
+    ):
+        if sanitySingle(
+            HNAP_fileIdentifier,
+            [schema_ref["08"]['CKAN API property']],
+            tmp
+        ):
+            # Might be a iso datetime
+            date_str = sanityFirst(tmp)
+            if date_str.count('T') == 1:
+                date_str = date_str.split('T')[0]
+
+            if sanityDate(
                     HNAP_fileIdentifier,
                     [schema_ref["08"]['CKAN API property']],
-                    tmp
-                ):
-                    # Might be a iso datetime
-                    date_str = sanityFirst(tmp)
-                    if date_str.count('T') == 1:
-                        date_str = date_str.split('T')[0]
-
-                    if sanityDate(
-                            HNAP_fileIdentifier,
-                            [schema_ref["08"]['CKAN API property']],
-                            date_str):
-                        json_record[schema_ref["08"]['CKAN API property']] =\
-                            date_str
+                    date_str):
+                json_record[schema_ref["08"]['CKAN API property']] =\
+                    date_str
 
 # CC::OpenMaps-09 Metadata Contact (French)
 
-            value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["09"])
-            if value:
-                json_record[schema_ref["09"]['CKAN API property']] = value
+    value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["09"])
+    if value:
+        json_record[schema_ref["09"]['CKAN API property']] = value
 
 # CC::OpenMaps-10 Parent identifier
 
-            value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["10"])
-            if value:
-                json_record[schema_ref["10"]['CKAN API property']] = value
+    value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["10"])
+    if value:
+        json_record[schema_ref["10"]['CKAN API property']] = value
 
 # CC::OpenMaps-11 Hierarchy level
 
-            value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["11"])
-            if value:
-                json_record[schema_ref["11"]['CKAN API property']] = value
+    value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["11"])
+    if value:
+        json_record[schema_ref["11"]['CKAN API property']] = value
 
 # CC::OpenMaps-12 File Identifier
 
-            json_record[schema_ref["12"]['CKAN API property']] =\
-                HNAP_fileIdentifier
+    json_record[schema_ref["12"]['CKAN API property']] =\
+        HNAP_fileIdentifier
 
 # CC::OpenMaps-13 Short Key
 
-            # Disabled as per the current install of RAMP
-            # json_record[schema_ref["13"]
-            # ['CKAN API property']] = HNAP_fileIdentifier[0:8]
+    # Disabled as per the current install of RAMP
+    # json_record[schema_ref["13"]
+    # ['CKAN API property']] = HNAP_fileIdentifier[0:8]
 
 # CC::OpenMaps-14 Title (English)
-            json_record[schema_ref["14"]['CKAN API property']] = {}
-            value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["14"])
-            if value:
-                json_record[
-                    schema_ref["14"]['CKAN API property']
-                ][CKAN_primary_lang] = value
+    json_record[schema_ref["14"]['CKAN API property']] = {}
+    value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["14"])
+    if value:
+        json_record[
+            schema_ref["14"]['CKAN API property']
+        ][CKAN_primary_lang] = value
 # CC::OpenMaps-15 Title (French)
-            value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["15"])
-            if value:
-                json_record[
-                    schema_ref["14"]['CKAN API property']
-                ][CKAN_secondary_lang] = value
+    value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["15"])
+    if value:
+        json_record[
+            schema_ref["14"]['CKAN API property']
+        ][CKAN_secondary_lang] = value
 
 # CC::OpenMaps-16 Publisher - Current Organization Name
 
-            org_strings = []
-            org_string = ''
-            attempt = ''
-            value = fetch_FGP_value(
-                record, HNAP_fileIdentifier, schema_ref["16a"])
-            if not value or len(value) < 1:
-                attempt += "No english value"
+    org_strings = []
+    org_string = ''
+    attempt = ''
+    value = fetch_FGP_value(
+        record, HNAP_fileIdentifier, schema_ref["16a"])
+    if not value or len(value) < 1:
+        attempt += "No english value"
+    else:
+        attempt += "Is english value ["+str(len(value))+"]"
+        for single_value in value:
+            if re.search("^Government of Canada;", single_value):
+                org_strings.append(single_value)
             else:
-                attempt += "Is english value ["+str(len(value))+"]"
-                for single_value in value:
-                    if re.search("^Government of Canada;", single_value):
-                        org_strings.append(single_value)
-                    else:
-                        attempt += " but no GoC prefix ["+single_value+"]"
+                attempt += " but no GoC prefix ["+single_value+"]"
 
-            value = fetch_FGP_value(
-                record, HNAP_fileIdentifier, schema_ref["16b"])
-            if not value or len(value) < 1:
-                attempt += ", no french value"
+    value = fetch_FGP_value(
+        record, HNAP_fileIdentifier, schema_ref["16b"])
+    if not value or len(value) < 1:
+        attempt += ", no french value"
+    else:
+        attempt += ", french ["+str(len(value))+"]"
+        for single_value in value:
+            if re.search("^Government du Canada;", single_value):
+                org_strings.append(single_value)
             else:
-                attempt += ", french ["+str(len(value))+"]"
-                for single_value in value:
-                    if re.search("^Government du Canada;", single_value):
-                        org_strings.append(single_value)
-                    else:
-                        attempt += " but no GdC ["+single_value+"]"
+                attempt += " but no GdC ["+single_value+"]"
 
-            if len(org_strings) < 1:
-                reportError(
-                    HNAP_fileIdentifier,[
-                        schema_ref["16"]['CKAN API property'],
-                        "Bad organizationName, no Government of Canada",
-                        attempt
-                    ])
-            else:
-                valid_orgs = []
-                for org_string in org_strings:
-                    GOC_Structure = org_string.strip().split(';')
-                    del GOC_Structure[0]
-
-                    # Append to contributor
-                    contributor_english = []
-                    contributor_french = []
-
-                    # At ths point you have ditched GOC and your checking for good
-                    # dept names
-                    for GOC_Div in GOC_Structure:
-                        # Are they in the CL?
-                        termsValue = fetchCLValue(
-                            GOC_Div, GC_Registry_of_Applied_Terms)
-                        if termsValue:
-                            contributor_english.append(termsValue[0])
-                            contributor_french.append(termsValue[2])
-                            if termsValue[1] == termsValue[3]:
-                                valid_orgs.append(termsValue[1].lower())
-                            else:
-                                valid_orgs.append((termsValue[1]+"-"+termsValue[3]).lower())
-                            break
-
-                # Unique the departments, don't need duplicates
-                valid_orgs = list(set(valid_orgs))
-
-                if len(valid_orgs) < 1:
-                    reportError(
-                        HNAP_fileIdentifier,[
-                            schema_ref["16"]['CKAN API property'],
-                            "No valid orgs found",
-                            org_string.strip()
-                        ])
-                else:
-                    json_record[schema_ref["16"]['CKAN API property']] = valid_orgs[0]
-
-                # Unique the departments, don't need duplicates
-                contributor_english = list(set(contributor_english))
-                contributor_french = list(set(contributor_french))
-
-                # Multiple owners, excess pushed to contrib
-                if len(valid_orgs) > 1:
-                    del valid_orgs[0]
-                    del contributor_english[0]
-                    del contributor_french[0]
-                    json_record[schema_ref["22"]['CKAN API property']] = {}
-                    json_record[schema_ref["22"]['CKAN API property']]['en'] = []
-                    json_record[schema_ref["22"]['CKAN API property']]['fr'] = []
-                    for org in valid_orgs:
-                        json_record[schema_ref["22"]['CKAN API property']]['en'] = ','.join(contributor_english)
-                        json_record[schema_ref["22"]['CKAN API property']]['fr'] = ','.join(contributor_french)
+    if len(org_strings) < 1:
+        reportError(
+            HNAP_fileIdentifier,[
+                schema_ref["16"]['CKAN API property'],
+                "Bad organizationName, no Government of Canada",
+                attempt
+            ])
+    else:
+        valid_orgs = []
+        for org_string in org_strings:
+            GOC_Structure = org_string.strip().split(';')
+            del GOC_Structure[0]
+
+            # Append to contributor
+            contributor_english = []
+            contributor_french = []
+
+            # At ths point you have ditched GOC and your checking for good
+            # dept names
+            for GOC_Div in GOC_Structure:
+                # Are they in the CL?
+                termsValue = fetchCLValue(
+                    GOC_Div, GC_Registry_of_Applied_Terms)
+                if termsValue:
+                    contributor_english.append(termsValue[0])
+                    contributor_french.append(termsValue[2])
+                    if termsValue[1] == termsValue[3]:
+                        valid_orgs.append(termsValue[1].lower())
+                    else:
+                        valid_orgs.append((termsValue[1]+"-"+termsValue[3]).lower())
+                    break
+
+        # Unique the departments, don't need duplicates
+        valid_orgs = list(set(valid_orgs))
+
+        if len(valid_orgs) < 1:
+            reportError(
+                HNAP_fileIdentifier,[
+                    schema_ref["16"]['CKAN API property'],
+                    "No valid orgs found",
+                    org_string.strip()
+                ])
+        else:
+            json_record[schema_ref["16"]['CKAN API property']] = valid_orgs[0]
+
+        # Unique the departments, don't need duplicates
+        contributor_english = list(set(contributor_english))
+        contributor_french = list(set(contributor_french))
+
+        # Multiple owners, excess pushed to contrib
+        if len(valid_orgs) > 1:
+            del valid_orgs[0]
+            del contributor_english[0]
+            del contributor_french[0]
+            json_record[schema_ref["22"]['CKAN API property']] = {}
+            json_record[schema_ref["22"]['CKAN API property']]['en'] = []
+            json_record[schema_ref["22"]['CKAN API property']]['fr'] = []
+            for org in valid_orgs:
+                json_record[schema_ref["22"]['CKAN API property']]['en'] = ','.join(contributor_english)
+                json_record[schema_ref["22"]['CKAN API property']]['fr'] = ','.join(contributor_french)
 
 # CC::OpenMaps-17 Publisher - Organization Name at Publication (English)
 #       CKAN defined/provided
@@ -438,9 +880,9 @@ def main():
 
 # CC::OpenMaps-21 Creator
 
-            value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["21"])
-            if value:
-                json_record[schema_ref["21"]['CKAN API property']] = ','.join(value)
+    value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["21"])
+    if value:
+        json_record[schema_ref["21"]['CKAN API property']] = ','.join(value)
 
 # CC::OpenMaps-22 Contributor (English)
 #       Intentionally left blank, assuming singular contribution
@@ -450,52 +892,52 @@ def main():
 # CC::OpenMaps-24 Position Name (English)
 # CC::OpenMaps-25 Position Name (French)
 
-            json_record[schema_ref["24"]['CKAN API property']] = {}
+    json_record[schema_ref["24"]['CKAN API property']] = {}
 
-            schema_ref["24"]['Occurrences'] = 'R'
-            primary_data = []
-            value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["24"])
-            if value:
-                for single_value in value:
-                    primary_data.append(value)
+    schema_ref["24"]['Occurrences'] = 'R'
+    primary_data = []
+    value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["24"])
+    if value:
+        for single_value in value:
+            primary_data.append(value)
 
-            if len(primary_data) > 0:
-                json_record[schema_ref["24"]['CKAN API property']][CKAN_primary_lang] = ','.join(value)
+    if len(primary_data) > 0:
+        json_record[schema_ref["24"]['CKAN API property']][CKAN_primary_lang] = ','.join(value)
 
-            schema_ref["25"]['Occurrences'] = 'R'
-            primary_data = []
-            value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["25"])
-            if value:
-                for single_value in value:
-                    primary_data.append(value)
+    schema_ref["25"]['Occurrences'] = 'R'
+    primary_data = []
+    value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["25"])
+    if value:
+        for single_value in value:
+            primary_data.append(value)
 
-            if len(primary_data) > 0:
-                json_record[schema_ref["24"]['CKAN API property']][CKAN_secondary_lang] = ','.join(value)
+    if len(primary_data) > 0:
+        json_record[schema_ref["24"]['CKAN API property']][CKAN_secondary_lang] = ','.join(value)
 
-            if len(json_record[schema_ref["24"]['CKAN API property']]) < 1:
-                del json_record[schema_ref["24"]['CKAN API property']]
+    if len(json_record[schema_ref["24"]['CKAN API property']]) < 1:
+        del json_record[schema_ref["24"]['CKAN API property']]
 
 # CC::OpenMaps-26 Role
 
-            # Single report out, multiple records combined
-            schema_ref["26"]['Occurrences'] = 'R'
-            primary_data = []
-            value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["26"])
-            if value:
-                for single_value in value:
-                    # Can you find the CL entry?
-                    termsValue = fetchCLValue(single_value, napCI_RoleCode)
-                    if not termsValue:
-                        reportError(
-                            HNAP_fileIdentifier,[
-                                schema_ref["26"]['CKAN API property'],
-                                'Value not found in '+schema_ref["26"]['Reference']
-                            ])
-                    else:
-                        primary_data.append(termsValue[0])
+    # Single report out, multiple records combined
+    schema_ref["26"]['Occurrences'] = 'R'
+    primary_data = []
+    value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["26"])
+    if value:
+        for single_value in value:
+            # Can you find the CL entry?
+            termsValue = fetchCLValue(single_value, napCI_RoleCode)
+            if not termsValue:
+                reportError(
+                    HNAP_fileIdentifier,[
+                        schema_ref["26"]['CKAN API property'],
+                        'Value not found in '+schema_ref["26"]['Reference']
+                    ])
+            else:
+                primary_data.append(termsValue[0])
 
-            if len(primary_data) > 0:
-                json_record[schema_ref["26"]['CKAN API property']] = ','.join(value)
+    if len(primary_data) > 0:
+        json_record[schema_ref["26"]['CKAN API property']] = ','.join(value)
 
 # CC::OpenMaps-27
 #       Undefined property number
@@ -504,167 +946,167 @@ def main():
 
 # CC::OpenMaps-29 Contact Information (English)
 
-            primary_vals = {}
-            primary_vals[CKAN_primary_lang] = {}
-
-            # deliveryPoint
-            value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["29a"])
-            if value:
-                for single_value in value:
-                    primary_vals[CKAN_primary_lang]['delivery_point'] = single_value
-            # city
-            value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["29b"])
-            if value:
-                for single_value in value:
-                    primary_vals[CKAN_primary_lang]['city'] = single_value
-            # administrativeArea
-            value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["29c"])
-            if value:
-                for single_value in value:
-                    primary_vals[CKAN_primary_lang]['administrative_area'] = single_value
-            # postalCode
-            value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["29d"])
-            if value:
-                for single_value in value:
-                    primary_vals[CKAN_primary_lang]['postal_code'] = single_value
-            # country
-            value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["29e"])
-            if value:
-                for single_value in value:
-                    primary_vals[CKAN_primary_lang]['country'] = single_value
-            # electronicMailAddress
-            value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["29f"])
-            if value:
-                for single_value in value:
-                    primary_vals[CKAN_primary_lang]['electronic_mail_address'] = single_value
-
-            if len(primary_vals[CKAN_primary_lang]) < 1:
-                reportError(
-                    HNAP_fileIdentifier,[
-                        schema_ref["29"]['CKAN API property'],
-                        'Value not found in '+schema_ref["29"]['Reference']
-                    ])
+    primary_vals = {}
+    primary_vals[CKAN_primary_lang] = {}
+
+    # deliveryPoint
+    value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["29a"])
+    if value:
+        for single_value in value:
+            primary_vals[CKAN_primary_lang]['delivery_point'] = single_value
+    # city
+    value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["29b"])
+    if value:
+        for single_value in value:
+            primary_vals[CKAN_primary_lang]['city'] = single_value
+    # administrativeArea
+    value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["29c"])
+    if value:
+        for single_value in value:
+            primary_vals[CKAN_primary_lang]['administrative_area'] = single_value
+    # postalCode
+    value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["29d"])
+    if value:
+        for single_value in value:
+            primary_vals[CKAN_primary_lang]['postal_code'] = single_value
+    # country
+    value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["29e"])
+    if value:
+        for single_value in value:
+            primary_vals[CKAN_primary_lang]['country'] = single_value
+    # electronicMailAddress
+    value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["29f"])
+    if value:
+        for single_value in value:
+            primary_vals[CKAN_primary_lang]['electronic_mail_address'] = single_value
+
+    if len(primary_vals[CKAN_primary_lang]) < 1:
+        reportError(
+            HNAP_fileIdentifier,[
+                schema_ref["29"]['CKAN API property'],
+                'Value not found in '+schema_ref["29"]['Reference']
+            ])
 
 # CC::OpenMaps-30 Contact Information (French)
 
-            primary_vals[CKAN_secondary_lang] = {}
-
-            # deliveryPoint
-            value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["30a"])
-            if value:
-                for single_value in value:
-                    primary_vals[CKAN_secondary_lang]['delivery_point'] = single_value
-            # city
-            value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["30b"])
-            if value:
-                for single_value in value:
-                    primary_vals[CKAN_secondary_lang]['city'] = single_value
-            # administrativeArea
-            value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["30c"])
-            if value:
-                for single_value in value:
-                    primary_vals[CKAN_secondary_lang]['administrative_area'] = single_value
-            # postalCode
-            value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["30d"])
-            if value:
-                for single_value in value:
-                    primary_vals[CKAN_secondary_lang]['postal_code'] = single_value
-            # country
-            value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["30e"])
-            if value:
-                for single_value in value:
-                    primary_vals[CKAN_secondary_lang]['country'] = single_value
-            # electronicMailAddress
-            value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["30f"])
-            if value:
-                for single_value in value:
-                    primary_vals[CKAN_secondary_lang]['electronic_mail_address'] = single_value
-
-            if len(primary_vals[CKAN_secondary_lang]) < 1:
-                reportError(
-                    HNAP_fileIdentifier,[
-                        schema_ref["30"]['CKAN API property'],
-                        'Value not found in '+schema_ref["30"]['Reference']
-                    ])
+    primary_vals[CKAN_secondary_lang] = {}
+
+    # deliveryPoint
+    value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["30a"])
+    if value:
+        for single_value in value:
+            primary_vals[CKAN_secondary_lang]['delivery_point'] = single_value
+    # city
+    value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["30b"])
+    if value:
+        for single_value in value:
+            primary_vals[CKAN_secondary_lang]['city'] = single_value
+    # administrativeArea
+    value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["30c"])
+    if value:
+        for single_value in value:
+            primary_vals[CKAN_secondary_lang]['administrative_area'] = single_value
+    # postalCode
+    value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["30d"])
+    if value:
+        for single_value in value:
+            primary_vals[CKAN_secondary_lang]['postal_code'] = single_value
+    # country
+    value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["30e"])
+    if value:
+        for single_value in value:
+            primary_vals[CKAN_secondary_lang]['country'] = single_value
+    # electronicMailAddress
+    value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["30f"])
+    if value:
+        for single_value in value:
+            primary_vals[CKAN_secondary_lang]['electronic_mail_address'] = single_value
+
+    if len(primary_vals[CKAN_secondary_lang]) < 1:
+        reportError(
+            HNAP_fileIdentifier,[
+                schema_ref["30"]['CKAN API property'],
+                'Value not found in '+schema_ref["30"]['Reference']
+            ])
 
-            json_record[schema_ref["29"]['CKAN API property']] = json.dumps(primary_vals)
+    json_record[schema_ref["29"]['CKAN API property']] = json.dumps(primary_vals)
 
 # CC::OpenMaps-31 Contact Email
 
-            # Single report out, multiple records combined
-            schema_ref["31"]['Occurrences'] = 'R'
-            json_record[schema_ref["31"]['CKAN API property']] = {}
-            value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["31"])
-            primary_data = []
-            if value:
-                for single_value in value:
-                    primary_data.append(single_value)
+    # Single report out, multiple records combined
+    schema_ref["31"]['Occurrences'] = 'R'
+    json_record[schema_ref["31"]['CKAN API property']] = {}
+    value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["31"])
+    primary_data = []
+    if value:
+        for single_value in value:
+            primary_data.append(single_value)
 
-            if len(primary_data) > 0:
-                json_record[schema_ref["31"]['CKAN API property']] = ','.join(value)
+    if len(primary_data) > 0:
+        json_record[schema_ref["31"]['CKAN API property']] = ','.join(value)
 
 # CC::OpenMaps-32 Description (English)
 
-            json_record[schema_ref["32"]['CKAN API property']] = {}
-            value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["32"])
-            if value:
-                json_record[
-                    schema_ref["32"]['CKAN API property']
-                ][CKAN_primary_lang] = value
+    json_record[schema_ref["32"]['CKAN API property']] = {}
+    value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["32"])
+    if value:
+        json_record[
+            schema_ref["32"]['CKAN API property']
+        ][CKAN_primary_lang] = value
 
-            # XXX Check that there are values
+    # XXX Check that there are values
 
 # CC::OpenMaps-33 Description (French)
 
-            value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["33"])
-            if value:
-                json_record[
-                    schema_ref["32"]['CKAN API property']
-                ][CKAN_secondary_lang] = value
+    value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["33"])
+    if value:
+        json_record[
+            schema_ref["32"]['CKAN API property']
+        ][CKAN_secondary_lang] = value
 
-            # XXX Check that there are values
+    # XXX Check that there are values
 
 # CC::OpenMaps-34 Keywords (English)
 
-            primary_vals = []
-            json_record[schema_ref["34"]['CKAN API property']] = {}
-            json_record[schema_ref["34"]['CKAN API property']][CKAN_primary_lang] = []
+    primary_vals = []
+    json_record[schema_ref["34"]['CKAN API property']] = {}
+    json_record[schema_ref["34"]['CKAN API property']][CKAN_primary_lang] = []
 
-            value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["34"])
-            if value:
-                for single_value in value:
-                    p = re.compile('^[A-Z][A-Z] [^>]+ > ')
-                    single_value = p.sub('', single_value)
-                    single_value = single_value.strip()
+    value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["34"])
+    if value:
+        for single_value in value:
+            p = re.compile('^[A-Z][A-Z] [^>]+ > ')
+            single_value = p.sub('', single_value)
+            single_value = single_value.strip()
 # ADAPTATION #4
 # 2016-05-27 - call
 # Alexandre Bolieux asked I replace commas with something valid.  I'm replacing them with semi-colons
 # which can act as a seperator character like the comma but get past that reserved character
-                    single_value = single_value.replace(',', ';')
+            single_value = single_value.replace(',', ';')
 # END ADAPTATION
-                    keyword_error = canada_tags(single_value).replace('"', '""')
+            keyword_error = canada_tags(single_value).replace('"', '""')
 
 # ADAPTATION #5
 # 2016-05-27 - call
 # Alexandre Bolieux asked if I could replace commas with something valid.  I'm
 # replacing them with semi-colons which can act as a seperator character like
 # the comma but get past that reserved character
-                    if re.search('length is more than maximum 140', keyword_error, re.UNICODE):
-                        pass
-                    else:
+            if re.search('length is more than maximum 140', keyword_error, re.UNICODE):
+                pass
+            else:
 # END ADAPTATION
-                        if not keyword_error == '':
-                        #if not re.search(schema_ref["34"]['RegEx Filter'], single_value,re.UNICODE):
-                            reportError(
-                                HNAP_fileIdentifier, [
-                                    schema_ref["34"]['CKAN API property']+'-'+CKAN_primary_lang,
-                                    "Invalid Keyword",
-                                    keyword_error
-                                    #"Must be alpha-numeric, space or '-_./>+& ["+single_value+']'
-                                ])
-                        else:
-                            if single_value not in json_record[schema_ref["34"]['CKAN API property']][CKAN_primary_lang]:
-                                json_record[schema_ref["34"]['CKAN API property']][CKAN_primary_lang].append(single_value)
+                if not keyword_error == '':
+                #if not re.search(schema_ref["34"]['RegEx Filter'], single_value,re.UNICODE):
+                    reportError(
+                        HNAP_fileIdentifier, [
+                            schema_ref["34"]['CKAN API property']+'-'+CKAN_primary_lang,
+                            "Invalid Keyword",
+                            keyword_error
+                            #"Must be alpha-numeric, space or '-_./>+& ["+single_value+']'
+                        ])
+                else:
+                    if single_value not in json_record[schema_ref["34"]['CKAN API property']][CKAN_primary_lang]:
+                        json_record[schema_ref["34"]['CKAN API property']][CKAN_primary_lang].append(single_value)
 
 #                        if not len(json_record[schema_ref["34"]['CKAN API property']][CKAN_primary_lang]):
 #                            reportError(
@@ -675,41 +1117,41 @@ def main():
 
 # CC::OpenMaps-35 Keywords (French)
 
-            json_record[schema_ref["34"]['CKAN API property']][CKAN_secondary_lang] = []
+    json_record[schema_ref["34"]['CKAN API property']][CKAN_secondary_lang] = []
 
-            value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["35"])
-            if value:
-                for single_value in value:
-                    p = re.compile('^[A-Z][A-Z] [^>]+ > ')
-                    single_value = p.sub('', single_value)
+    value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["35"])
+    if value:
+        for single_value in value:
+            p = re.compile('^[A-Z][A-Z] [^>]+ > ')
+            single_value = p.sub('', single_value)
 # ADAPTATION #4
 # 2016-05-27 - call
 # Alexandre Bolieux asked if I could replace commas with something valid.  I'm
 # replacing them with semi-colons which can act as a seperator character like
 # the comma but get past that reserved character
-                    single_value = single_value.replace(',', ';')
+            single_value = single_value.replace(',', ';')
 # END ADAPTATION
-                    keyword_error = canada_tags(single_value).replace('"', '""')
+            keyword_error = canada_tags(single_value).replace('"', '""')
 
 # ADAPTATION #5
 # 2016-05-27 - call
 # Alexandre Bolieux asked I drop keywords that exceed 140 characters
-                    if re.search('length is more than maximum 140', keyword_error, re.UNICODE):
-                        pass
-                    else:
+            if re.search('length is more than maximum 140', keyword_error, re.UNICODE):
+                pass
+            else:
 # END ADAPTATION
-                        if not keyword_error == '':
-                        #if not re.search(schema_ref["34"]['RegEx Filter'], single_value,re.UNICODE):
-                            reportError(
-                                HNAP_fileIdentifier, [
-                                    schema_ref["34"]['CKAN API property']+'-'+CKAN_secondary_lang,
-                                    "Invalid Keyword",
-                                    keyword_error
-                                    #'Must be alpha-numeric, space or -_./>+& ['+single_value+']'
-                                ])
-                        else:
-                            if single_value not in json_record[schema_ref["34"]['CKAN API property']][CKAN_secondary_lang]:
-                                json_record[schema_ref["34"]['CKAN API property']][CKAN_secondary_lang].append(single_value)
+                if not keyword_error == '':
+                #if not re.search(schema_ref["34"]['RegEx Filter'], single_value,re.UNICODE):
+                    reportError(
+                        HNAP_fileIdentifier, [
+                            schema_ref["34"]['CKAN API property']+'-'+CKAN_secondary_lang,
+                            "Invalid Keyword",
+                            keyword_error
+                            #'Must be alpha-numeric, space or -_./>+& ['+single_value+']'
+                        ])
+                else:
+                    if single_value not in json_record[schema_ref["34"]['CKAN API property']][CKAN_secondary_lang]:
+                        json_record[schema_ref["34"]['CKAN API property']][CKAN_secondary_lang].append(single_value)
 
 #                        if not len(json_record[schema_ref["34"]['CKAN API property']][CKAN_secondary_lang]):
 #                            reportError(
@@ -720,44 +1162,44 @@ def main():
 
 # CC::OpenMaps-36 Subject
 
-            subject_values = []
-            value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["36"])
-            if value:
-                for subject in value:
-                    termsValue = fetchCLValue(
-                        subject.strip(), CL_Subjects)
-                    if termsValue:
-                        for single_item in termsValue[3].split(','):
-                            subject_values.append(single_item.strip().lower())
-
-                if len(subject_values) < 1:
-                    reportError(
-                        HNAP_fileIdentifier,[
-                            schema_ref["36"]['CKAN API property'],
-                            'Value not found in '+schema_ref["36"]['Reference']
-                        ])
-                else:
-                    json_record[schema_ref["36"]['CKAN API property']] = list(set(subject_values))
+    subject_values = []
+    value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["36"])
+    if value:
+        for subject in value:
+            termsValue = fetchCLValue(
+                subject.strip(), CL_Subjects)
+            if termsValue:
+                for single_item in termsValue[3].split(','):
+                    subject_values.append(single_item.strip().lower())
+
+        if len(subject_values) < 1:
+            reportError(
+                HNAP_fileIdentifier,[
+                    schema_ref["36"]['CKAN API property'],
+                    'Value not found in '+schema_ref["36"]['Reference']
+                ])
+        else:
+            json_record[schema_ref["36"]['CKAN API property']] = list(set(subject_values))
 
 # CC::OpenMaps-37 Topic Category
 
-            topicCategory_values = []
-            value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["37"])
-            if value:
-                for topicCategory in value:
-                    termsValue = fetchCLValue(
-                        topicCategory.strip(), napMD_KeywordTypeCode)
-                    if termsValue:
-                        topicCategory_values.append(termsValue[0])
-
-                if len(topicCategory_values) < 1:
-                    reportError(
-                        HNAP_fileIdentifier,[
-                            schema_ref["37"]['CKAN API property'],
-                            'Value not found in '+schema_ref["37"]['Reference']
-                        ])
-                else:
-                    json_record[schema_ref["37"]['CKAN API property']] = topicCategory_values
+    topicCategory_values = []
+    value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["37"])
+    if value:
+        for topicCategory in value:
+            termsValue = fetchCLValue(
+                topicCategory.strip(), napMD_KeywordTypeCode)
+            if termsValue:
+                topicCategory_values.append(termsValue[0])
+
+        if len(topicCategory_values) < 1:
+            reportError(
+                HNAP_fileIdentifier,[
+                    schema_ref["37"]['CKAN API property'],
+                    'Value not found in '+schema_ref["37"]['Reference']
+                ])
+        else:
+            json_record[schema_ref["37"]['CKAN API property']] = topicCategory_values
 
 
 # CC::OpenMaps-38 Audience
@@ -771,47 +1213,47 @@ def main():
 
 # CC::OpenMaps-41 Spatial
 
-            north = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["41n"])
-            if north:
-                south = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["41s"])
-                if south:
-                    east = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["41e"])
-                    if east:
-                        west = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["41w"])
-                        if west:
-
-                            # ensure we have proper numbers
-                            north = [float(north[0]) if '.' in north[0] else int(north[0])]
-                            east = [float(east[0]) if '.' in east[0] else int(east[0])]
-                            south = [float(south[0]) if '.' in south[0] else int(south[0])]
-                            west = [float(west[0]) if '.' in west[0] else int(west[0])]
-
-                            GeoJSON = {}
-                            GeoJSON['type'] = "Polygon"
-                            GeoJSON['coordinates'] = [[
-                                [west, south],
-                                [east, south],
-                                [east, north],
-                                [west, north],
-                                [west, south]
-                            ]]
-
-                            #json_record[schema_ref["41"]['CKAN API property']] = json.dumps(GeoJSON)
-                            json_record[schema_ref["41"]['CKAN API property']] = '{"type": "Polygon","coordinates": [[[%s,%s],[%s,%s],[%s,%s],[%s,%s],[%s,%s]]]}' % (west[0],south[0],east[0],south[0],east[0],north[0],west[0],north[0],west[0],south[0])
+    north = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["41n"])
+    if north:
+        south = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["41s"])
+        if south:
+            east = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["41e"])
+            if east:
+                west = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["41w"])
+                if west:
+
+                    # ensure we have proper numbers
+                    north = [float(north[0]) if '.' in north[0] else int(north[0])]
+                    east = [float(east[0]) if '.' in east[0] else int(east[0])]
+                    south = [float(south[0]) if '.' in south[0] else int(south[0])]
+                    west = [float(west[0]) if '.' in west[0] else int(west[0])]
+
+                    GeoJSON = {}
+                    GeoJSON['type'] = "Polygon"
+                    GeoJSON['coordinates'] = [[
+                        [west, south],
+                        [east, south],
+                        [east, north],
+                        [west, north],
+                        [west, south]
+                    ]]
+
+                    #json_record[schema_ref["41"]['CKAN API property']] = json.dumps(GeoJSON)
+                    json_record[schema_ref["41"]['CKAN API property']] = '{"type": "Polygon","coordinates": [[[%s,%s],[%s,%s],[%s,%s],[%s,%s],[%s,%s]]]}' % (west[0],south[0],east[0],south[0],east[0],north[0],west[0],north[0],west[0],south[0])
 
 # CC::OpenMaps-42 Geographic Region Name
 # TBS 2016-04-13: Not in HNAP, we can skip (the only providing the bounding box, not the region name)
 
 # CC::OpenMaps-43 Time Period Coverage Start Date
-            value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["43"])
-            if value:
-                if sanityDate(
-                    HNAP_fileIdentifier,[
-                        schema_ref["43"]['CKAN API property']+'-start'
-                    ],
-                    maskDate(value)
-                ):
-                    json_record[schema_ref["43"]['CKAN API property']] = maskDate(value)
+    value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["43"])
+    if value:
+        if sanityDate(
+            HNAP_fileIdentifier,[
+                schema_ref["43"]['CKAN API property']+'-start'
+            ],
+            maskDate(value)
+        ):
+            json_record[schema_ref["43"]['CKAN API property']] = maskDate(value)
 
 # CC::OpenMaps-44 Time Period Coverage End Date
 #   ADAPTATION #2
@@ -828,105 +1270,101 @@ def main():
 #     replacing a blank entry with the equally ugly '9999-99-99' forced
 #     end in CKAN.
 
-            value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["44"])
-            if value:
+    value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["44"])
+    if value:
 
-                check_for_blank = value
-                if check_for_blank == '':
-                    check_for_blank = '9999-09-09'
+        check_for_blank = value
+        if check_for_blank == '':
+            check_for_blank = '9999-09-09'
 
-                if sanityDate(
-                    HNAP_fileIdentifier,[
-                        schema_ref["44"]['CKAN API property']+'-end'
-                    ],
-                    maskDate(check_for_blank)
-                ):
-                    json_record[schema_ref["44"]['CKAN API property']] = maskDate(check_for_blank)
+        if sanityDate(
+            HNAP_fileIdentifier,[
+                schema_ref["44"]['CKAN API property']+'-end'
+            ],
+            maskDate(check_for_blank)
+        ):
+            json_record[schema_ref["44"]['CKAN API property']] = maskDate(check_for_blank)
 
 # CC::OpenMaps-45 Maintenance and Update Frequency
 
-            value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["45"])
-            if value:
-                # Can you find the CL entry?
-                termsValue = fetchCLValue(value, napMD_MaintenanceFrequencyCode)
-                if not termsValue:
-                    reportError(
-                        HNAP_fileIdentifier,[
-                            schema_ref["45"]['CKAN API property'],
-                            'Value not found in '+schema_ref["45"]['Reference']
-                        ])
-                else:
-                    json_record[schema_ref["45"]['CKAN API property']] = termsValue[2]
+    value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["45"])
+    if value:
+        # Can you find the CL entry?
+        termsValue = fetchCLValue(value, napMD_MaintenanceFrequencyCode)
+        if not termsValue:
+            reportError(
+                HNAP_fileIdentifier,[
+                    schema_ref["45"]['CKAN API property'],
+                    'Value not found in '+schema_ref["45"]['Reference']
+                ])
+        else:
+            json_record[schema_ref["45"]['CKAN API property']] = termsValue[2]
 
 
 # CC::OpenMaps-46 Date Published
 # CC::OpenMaps-47 Date Modified
 
-            ##################################################
-            # These are a little different, we have to do these odd birds manually
-            r = record.xpath(
-                schema_ref["46"]["FGP XPATH"],
-                namespaces={
-                    'gmd': 'http://www.isotc211.org/2005/gmd',
-                    'gco': 'http://www.isotc211.org/2005/gco'})
-            if(len(r)):
-                for cn in r:
-                    input_types = {}
-                    inKey = []
-                    inVal = ''
-                    # Decypher which side has the code and which has the data,
-                    # yea... it changes -sigh-
-                    # Keys will always use the ;
-                    if cn[0][0].text is not None and len(cn[0][0].text.split(';')) > 1:
-                        inKey = cn[0][0].text.split(';')
-                        inVal = cn[1][0].text.strip()
-                    elif cn[1][0].text is not None:
-                        inKey = cn[1][0].text.split(';')
-                        inVal = cn[0][0].text.strip()
-
-                    for input_type in inKey:
-                        input_type = input_type.strip()
-                        if input_type == u'publication':
-                            if sanityDate(
-                                    HNAP_fileIdentifier,[
-                                        schema_ref["46"]['CKAN API property']
-                                    ],
-                                    maskDate(inVal)):
-                                json_record[schema_ref["46"]['CKAN API property']] = maskDate(inVal)
-                                break
-
-                        if input_type == u'revision' or input_type == u'révision':
-                            if sanityDate(
-                                    HNAP_fileIdentifier,[
-                                        schema_ref["47"]['CKAN API property']
-                                    ],
-                                    maskDate(inVal)):
-                                json_record[schema_ref["47"]['CKAN API property']] = maskDate(inVal)
-                                break
-
-                # Check the field is populated if you have to
-                if schema_ref["46"]['Requirement'] == 'M' and schema_ref["46"]['CKAN API property'] not in json_record:
-                    reportError(
-                        HNAP_fileIdentifier,[
-                            schema_ref["46"]['CKAN API property'],
-                            'Value not found in '+schema_ref["46"]['Reference']
-                        ])
+    ##################################################
+    # These are a little different, we have to do these odd birds manually
+    r = schema_ref["46"].xpath(record)
+    if(len(r)):
+        for cn in r:
+            input_types = {}
+            inKey = []
+            inVal = ''
+            # Decypher which side has the code and which has the data,
+            # yea... it changes -sigh-
+            # Keys will always use the ;
+            if cn[0][0].text is not None and len(cn[0][0].text.split(';')) > 1:
+                inKey = cn[0][0].text.split(';')
+                inVal = cn[1][0].text.strip()
+            elif cn[1][0].text is not None:
+                inKey = cn[1][0].text.split(';')
+                inVal = cn[0][0].text.strip()
+
+            for input_type in inKey:
+                input_type = input_type.strip()
+                if input_type == u'publication':
+                    if sanityDate(
+                            HNAP_fileIdentifier,[
+                                schema_ref["46"]['CKAN API property']
+                            ],
+                            maskDate(inVal)):
+                        json_record[schema_ref["46"]['CKAN API property']] = maskDate(inVal)
+                        break
 
-                # Check the field is populated if you have to
-                if schema_ref["47"]['Requirement'] == 'M' and schema_ref["47"]['CKAN API property'] not in json_record:
-                    reportError(
-                        HNAP_fileIdentifier,[
-                            schema_ref["47"]['CKAN API property'],
-                            'Value not found in '+schema_ref["47"]['Reference']
-                        ])
+                if input_type == u'revision' or input_type == u'révision':
+                    if sanityDate(
+                            HNAP_fileIdentifier,[
+                                schema_ref["47"]['CKAN API property']
+                            ],
+                            maskDate(inVal)):
+                        json_record[schema_ref["47"]['CKAN API property']] = maskDate(inVal)
+                        break
 
+        # Check the field is populated if you have to
+        if schema_ref["46"]['Requirement'] == 'M' and schema_ref["46"]['CKAN API property'] not in json_record:
+            reportError(
+                HNAP_fileIdentifier,[
+                    schema_ref["46"]['CKAN API property'],
+                    'Value not found in '+schema_ref["46"]['Reference']
+                ])
+
+        # Check the field is populated if you have to
+        if schema_ref["47"]['Requirement'] == 'M' and schema_ref["47"]['CKAN API property'] not in json_record:
+            reportError(
+                HNAP_fileIdentifier,[
+                    schema_ref["47"]['CKAN API property'],
+                    'Value not found in '+schema_ref["47"]['Reference']
+                ])
 
-            if 'date_published' not in json_record:
-                reportError(
-                    HNAP_fileIdentifier,[
-                        schema_ref["37"]['CKAN API property'],
-                        'mandatory field missing'
-                    ])
+
+    if 'date_published' not in json_record:
+        reportError(
+            HNAP_fileIdentifier,[
+                schema_ref["37"]['CKAN API property'],
+                'mandatory field missing'
+            ])
 
 # CC::OpenMaps-48 Date Released
 # SYSTEM GENERATED
@@ -951,253 +1389,253 @@ def main():
 
 # CC::OpenMaps-56 Reference System Information
 
-            # Allow for multiple refrence definitions
-            # Updated implementation mimics prior behaviour.
-            possible_refrences = fetchXMLArray(
-                record,
-                schema_ref["56"]['FGP XPATH'])
-
-            if len(possible_refrences) == 0:
-                reportError(
-                    HNAP_fileIdentifier,[
-                        schema_ref["56"]['CKAN API property'],
-                        'No projection information found'
-                    ])
-            else:
-                first_full_triplet = ''
-                for possible_refrence in possible_refrences:
-                    vala = valb = valc = ''
-
-                    # code
-                    value = fetch_FGP_value(possible_refrence, HNAP_fileIdentifier, schema_ref["56a"])
-                    if value:
-                        vala = value
-                    # codeSpace
-                    value = fetch_FGP_value(possible_refrence, HNAP_fileIdentifier, schema_ref["56b"])
-                    if value:
-                        valb = value
-                    # version
-                    value = fetch_FGP_value(possible_refrence, HNAP_fileIdentifier, schema_ref["56c"])
-                    if value:
-                        valc = value
-
-                    # Apply your business logic, this is the same logic as before assuming a single projection
-                    # If this is to become multiple projections the property needs to be changed into an array
-                    # in the schema and _then_ in CKAN.
-                    if vala != '' and valb != '' and valc != '':
-                        first_full_triplet = vala+','+valb+','+valc
-                        json_record[schema_ref["56"]['CKAN API property']] = first_full_triplet
-                        break
-                
-                # if the triplet is not complete then fail over to just the mandatory HNAP requirement
-                if first_full_triplet == '':
-
-                    rs_identifier = fetch_FGP_value(possible_refrences[0], HNAP_fileIdentifier, schema_ref["56a"])
+    # Allow for multiple refrence definitions
+    # Updated implementation mimics prior behaviour.
+    possible_refrences = fetchXMLArray(
+        record,
+        schema_ref["56"].xpath)
 
-                    if len(rs_identifier) > 0:
-
-                        first_full_triplet = rs_identifier+','+fetch_FGP_value(possible_refrences[0], HNAP_fileIdentifier, schema_ref["56b"])+','+fetch_FGP_value(possible_refrences[0], HNAP_fileIdentifier, schema_ref["56c"])
-                    
-                    if first_full_triplet == '':
-                        reportError(
-                            HNAP_fileIdentifier,[
-                                schema_ref["56"]['CKAN API property'],
-                                'Complete triplet not found'
-                            ])
-
-# CC::OpenMaps-57 Distributor (English)
-
-            primary_vals = {}
-            primary_vals[CKAN_primary_lang] = {}
-            primary_vals[CKAN_secondary_lang] = {}
-
-            # organizationName
-            value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["57a"])
-            if value:
-                for single_value in value:
-                    primary_vals[CKAN_primary_lang]['organization_name'] = single_value
-            value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["58a"])
-            if value:
-                for single_value in value:
-                    primary_vals[CKAN_secondary_lang]['organization_name'] = single_value
+    if len(possible_refrences) == 0:
+        reportError(
+            HNAP_fileIdentifier,[
+                schema_ref["56"]['CKAN API property'],
+                'No projection information found'
+            ])
+    else:
+        first_full_triplet = ''
+        for possible_refrence in possible_refrences:
+            vala = valb = valc = ''
 
-            # phone
-            value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["57b"])
-            if value:
-                for single_value in value:
-                    primary_vals[CKAN_primary_lang]['phone'] = single_value
-            value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["58b"])
+            # code
+            value = fetch_FGP_value(possible_refrence, HNAP_fileIdentifier, schema_ref["56a"])
             if value:
-                for single_value in value:
-                    primary_vals[CKAN_secondary_lang]['phone'] = single_value
-
-            # address
-            value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["57c"])
+                vala = value
+            # codeSpace
+            value = fetch_FGP_value(possible_refrence, HNAP_fileIdentifier, schema_ref["56b"])
             if value:
-                for single_value in value:
-                    primary_vals[CKAN_primary_lang]['address'] = single_value
-            value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["58c"])
+                valb = value
+            # version
+            value = fetch_FGP_value(possible_refrence, HNAP_fileIdentifier, schema_ref["56c"])
             if value:
-                for single_value in value:
-                    primary_vals[CKAN_secondary_lang]['address'] = single_value
+                valc = value
+
+            # Apply your business logic, this is the same logic as before assuming a single projection
+            # If this is to become multiple projections the property needs to be changed into an array
+            # in the schema and _then_ in CKAN.
+            if vala != '' and valb != '' and valc != '':
+                first_full_triplet = vala+','+valb+','+valc
+                json_record[schema_ref["56"]['CKAN API property']] = first_full_triplet
+                break
+        
+        # if the triplet is not complete then fail over to just the mandatory HNAP requirement
+        if first_full_triplet == '':
 
-            # city
-            value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["57d"])
-            if value:
-                for single_value in value:
-                    primary_vals[CKAN_primary_lang]['city'] = single_value
-            value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["58d"])
-            if value:
-                for single_value in value:
-                    primary_vals[CKAN_secondary_lang]['city'] = single_value
+            rs_identifier = fetch_FGP_value(possible_refrences[0], HNAP_fileIdentifier, schema_ref["56a"])
 
-            # administrativeArea
-            value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["57e"])
-            if value:
-                for single_value in value:
-                    primary_vals[CKAN_primary_lang]['administrative_area'] = single_value
-            value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["58e"])
-            if value:
-                for single_value in value:
-                    primary_vals[CKAN_secondary_lang]['administrative_area'] = single_value
+            if len(rs_identifier) > 0:
 
-            # postalCode
-            value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["57f"])
-            if value:
-                for single_value in value:
-                    primary_vals[CKAN_primary_lang]['postal_code'] = single_value
-            value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["58f"])
-            if value:
-                for single_value in value:
-                    primary_vals[CKAN_secondary_lang]['postal_code'] = single_value
-
-            # country
-            value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["57g"])
-            if value:
-                for single_value in value:
-                    primary_vals[CKAN_primary_lang]['country'] = single_value
-            value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["58g"])
-            if value:
-                for single_value in value:
-                    primary_vals[CKAN_secondary_lang]['country'] = single_value
+                first_full_triplet = rs_identifier+','+fetch_FGP_value(possible_refrences[0], HNAP_fileIdentifier, schema_ref["56b"])+','+fetch_FGP_value(possible_refrences[0], HNAP_fileIdentifier, schema_ref["56c"])
+            
+            if first_full_triplet == '':
+                reportError(
+                    HNAP_fileIdentifier,[
+                        schema_ref["56"]['CKAN API property'],
+                        'Complete triplet not found'
+                    ])
 
-            # electronicMailAddress  mandatory
-            value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["57h"])
-            if value:
-                for single_value in value:
-                    primary_vals[CKAN_primary_lang]['electronic_mail_address'] = single_value
-            value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["58h"])
-            if value:
-                for single_value in value:
-                    primary_vals[CKAN_secondary_lang]['electronic_mail_address'] = single_value
+# CC::OpenMaps-57 Distributor (English)
 
-            # role mandatory
-            value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["57i"])
-            if value:
-                for single_value in value:
-                    # Can you find the CL entry?
-                    termsValue = fetchCLValue(single_value, napCI_RoleCode)
-                    if not termsValue:
-                        reportError(
-                            HNAP_fileIdentifier,[
-                                schema_ref["57"]['CKAN API property'],
-                                'Value not found in '+schema_ref["57"]['Reference']
-                            ])
-                    else:
-                        primary_vals[CKAN_primary_lang]['role'] = termsValue[0]
-                        primary_vals[CKAN_secondary_lang]['role'] = termsValue[1]
+    primary_vals = {}
+    primary_vals[CKAN_primary_lang] = {}
+    primary_vals[CKAN_secondary_lang] = {}
+
+    # organizationName
+    value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["57a"])
+    if value:
+        for single_value in value:
+            primary_vals[CKAN_primary_lang]['organization_name'] = single_value
+    value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["58a"])
+    if value:
+        for single_value in value:
+            primary_vals[CKAN_secondary_lang]['organization_name'] = single_value
+
+    # phone
+    value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["57b"])
+    if value:
+        for single_value in value:
+            primary_vals[CKAN_primary_lang]['phone'] = single_value
+    value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["58b"])
+    if value:
+        for single_value in value:
+            primary_vals[CKAN_secondary_lang]['phone'] = single_value
+
+    # address
+    value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["57c"])
+    if value:
+        for single_value in value:
+            primary_vals[CKAN_primary_lang]['address'] = single_value
+    value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["58c"])
+    if value:
+        for single_value in value:
+            primary_vals[CKAN_secondary_lang]['address'] = single_value
+
+    # city
+    value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["57d"])
+    if value:
+        for single_value in value:
+            primary_vals[CKAN_primary_lang]['city'] = single_value
+    value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["58d"])
+    if value:
+        for single_value in value:
+            primary_vals[CKAN_secondary_lang]['city'] = single_value
+
+    # administrativeArea
+    value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["57e"])
+    if value:
+        for single_value in value:
+            primary_vals[CKAN_primary_lang]['administrative_area'] = single_value
+    value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["58e"])
+    if value:
+        for single_value in value:
+            primary_vals[CKAN_secondary_lang]['administrative_area'] = single_value
+
+    # postalCode
+    value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["57f"])
+    if value:
+        for single_value in value:
+            primary_vals[CKAN_primary_lang]['postal_code'] = single_value
+    value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["58f"])
+    if value:
+        for single_value in value:
+            primary_vals[CKAN_secondary_lang]['postal_code'] = single_value
+
+    # country
+    value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["57g"])
+    if value:
+        for single_value in value:
+            primary_vals[CKAN_primary_lang]['country'] = single_value
+    value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["58g"])
+    if value:
+        for single_value in value:
+            primary_vals[CKAN_secondary_lang]['country'] = single_value
+
+    # electronicMailAddress  mandatory
+    value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["57h"])
+    if value:
+        for single_value in value:
+            primary_vals[CKAN_primary_lang]['electronic_mail_address'] = single_value
+    value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["58h"])
+    if value:
+        for single_value in value:
+            primary_vals[CKAN_secondary_lang]['electronic_mail_address'] = single_value
+
+    # role mandatory
+    value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["57i"])
+    if value:
+        for single_value in value:
+            # Can you find the CL entry?
+            termsValue = fetchCLValue(single_value, napCI_RoleCode)
+            if not termsValue:
+                reportError(
+                    HNAP_fileIdentifier,[
+                        schema_ref["57"]['CKAN API property'],
+                        'Value not found in '+schema_ref["57"]['Reference']
+                    ])
+            else:
+                primary_vals[CKAN_primary_lang]['role'] = termsValue[0]
+                primary_vals[CKAN_secondary_lang]['role'] = termsValue[1]
 
-            json_record[schema_ref["57"]['CKAN API property']] = json.dumps(primary_vals)
+    json_record[schema_ref["57"]['CKAN API property']] = json.dumps(primary_vals)
 
-            #json_record[schema_ref["57"]['CKAN API property']] = {}
-            #json_record[schema_ref["57"]['CKAN API property']][CKAN_primary_lang] = ','.join(primary_vals)
-            #json_record[schema_ref["57"]['CKAN API property']][CKAN_secondary_lang] = ','.join(second_vals)
+    #json_record[schema_ref["57"]['CKAN API property']] = {}
+    #json_record[schema_ref["57"]['CKAN API property']][CKAN_primary_lang] = ','.join(primary_vals)
+    #json_record[schema_ref["57"]['CKAN API property']][CKAN_secondary_lang] = ','.join(second_vals)
 
 # CC::OpenMaps-59 Status
 
-            value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["59"])
-            if value:
-                # Can you find the CL entry?
-                termsValue = fetchCLValue(value, napMD_ProgressCode)
-                if not termsValue:
-                    reportError(
-                        HNAP_fileIdentifier,[
-                            schema_ref["59"]['CKAN API property'],
-                            'Value not found in '+schema_ref["59"]['Reference']
-                        ])
-                else:
-                    json_record[schema_ref["59"]['CKAN API property']] = termsValue[0]
+    value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["59"])
+    if value:
+        # Can you find the CL entry?
+        termsValue = fetchCLValue(value, napMD_ProgressCode)
+        if not termsValue:
+            reportError(
+                HNAP_fileIdentifier,[
+                    schema_ref["59"]['CKAN API property'],
+                    'Value not found in '+schema_ref["59"]['Reference']
+                ])
+        else:
+            json_record[schema_ref["59"]['CKAN API property']] = termsValue[0]
 
 # CC::OpenMaps-60 Association Type
 
-            associationTypes_array = []
-
-            value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["60"])
-            # Not mandatory, process if you have it
-            if value and len(value) > 0:
-                # You have to itterate to find a valid one, not neccesaraly the
-                for associationType in value:
-                    # Can you find the CL entry?
-                    termsValue = fetchCLValue(
-                        associationType, napDS_AssociationTypeCode)
-                    if not termsValue:
-                        termsValue = []
-                    else:
-                        associationTypes_array.append(termsValue[2])
+    associationTypes_array = []
+
+    value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["60"])
+    # Not mandatory, process if you have it
+    if value and len(value) > 0:
+        # You have to itterate to find a valid one, not neccesaraly the
+        for associationType in value:
+            # Can you find the CL entry?
+            termsValue = fetchCLValue(
+                associationType, napDS_AssociationTypeCode)
+            if not termsValue:
+                termsValue = []
+            else:
+                associationTypes_array.append(termsValue[2])
 
-            if len(associationTypes_array):
-                json_record[schema_ref["60"]['CKAN API property']] = ','.join(associationTypes_array)
+    if len(associationTypes_array):
+        json_record[schema_ref["60"]['CKAN API property']] = ','.join(associationTypes_array)
 
 # CC::OpenMaps-61 Aggregate Dataset Identifier
 
-            aggregateDataSetIdentifier_array = []
+    aggregateDataSetIdentifier_array = []
 
-            value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["61"])
-            # Not mandatory, process if you have it
-            if value and len(value) > 0:
-                for aggregateDataSetIdentifier in value:
-                    (primary, secondary) =\
-                        aggregateDataSetIdentifier.strip().split(';')
-                    aggregateDataSetIdentifier_array.append(primary.strip())
-                    aggregateDataSetIdentifier_array.append(secondary.strip())
+    value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["61"])
+    # Not mandatory, process if you have it
+    if value and len(value) > 0:
+        for aggregateDataSetIdentifier in value:
+            (primary, secondary) =\
+                aggregateDataSetIdentifier.strip().split(';')
+            aggregateDataSetIdentifier_array.append(primary.strip())
+            aggregateDataSetIdentifier_array.append(secondary.strip())
 
-            json_record[schema_ref["61"]['CKAN API property']] = ','.join(
-                aggregateDataSetIdentifier_array)
+    json_record[schema_ref["61"]['CKAN API property']] = ','.join(
+        aggregateDataSetIdentifier_array)
 
 # CC::OpenMaps-62 Spatial Representation Type
 
-            value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["62"])
-
-            json_record[schema_ref["62"]['CKAN API property']] = {}
-            spatialRepresentationType_array = []
-
-            if value:
-                # You have to itterate to find a valid one,
-                # not neccesaraly the first
-                for spatialRepresentationType in value:
-                    # Can you find the CL entry?
-                    termsValue = fetchCLValue(
-                        spatialRepresentationType,
-                        napMD_SpatialRepresentationTypeCode)
-                    if not termsValue:
-                        termsValue = []
-                    else:
-                        spatialRepresentationType_array.append(termsValue[0])
-            
-            # json_record[schema_ref["62"]['CKAN API property']] = ','.join(
-            # spatialRepresentationType_array)
+    value = fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref["62"])
+
+    json_record[schema_ref["62"]['CKAN API property']] = {}
+    spatialRepresentationType_array = []
+
+    if value:
+        # You have to itterate to find a valid one,
+        # not neccesaraly the first
+        for spatialRepresentationType in value:
+            # Can you find the CL entry?
+            termsValue = fetchCLValue(
+                spatialRepresentationType,
+                napMD_SpatialRepresentationTypeCode)
+            if not termsValue:
+                termsValue = []
+            else:
+                spatialRepresentationType_array.append(termsValue[0])
+    
+    # json_record[schema_ref["62"]['CKAN API property']] = ','.join(
+    # spatialRepresentationType_array)
 
-            json_record[schema_ref["62"]['CKAN API property']] = spatialRepresentationType_array
+    json_record[schema_ref["62"]['CKAN API property']] = spatialRepresentationType_array
 
 # CC::OpenMaps-63 Jurisdiction
 # TBS 2016-04-13: Not in HNAP, but can we default text to ‘Federal’ / ‘Fédéral
 
-            json_record[schema_ref["63"]['CKAN API property']] = schema_ref["63"]['FGP XPATH']
+    json_record[schema_ref["63"]['CKAN API property']] = schema_ref["63"]['FGP XPATH']
 
 # CC::OpenMaps-64 Licence
 # TBS (call): use ca-ogl-lgo
 
-            json_record[schema_ref["64"]['CKAN API property']] = schema_ref["64"]['FGP XPATH']
+    json_record[schema_ref["64"]['CKAN API property']] = schema_ref["64"]['FGP XPATH']
 
 # Ignored code from previous harvestor that would trigger an error on
 # invalid supplied licences.  We now assume the OGL is understood as
@@ -1328,129 +1766,129 @@ def main():
 #
 # How about September 1?
 
-            json_record['resources'] = []
-            record_resources = fetchXMLArray(
-                record,
-                "gmd:distributionInfo/" +
-                "gmd:MD_Distribution/" +
-                "gmd:transferOptions/" +
-                "gmd:MD_DigitalTransferOptions/" +
-                "gmd:onLine/" +
-                "gmd:CI_OnlineResource")
+    json_record['resources'] = []
+    record_resources = fetchXMLArray(
+        record,
+        "gmd:distributionInfo/" +
+        "gmd:MD_Distribution/" +
+        "gmd:transferOptions/" +
+        "gmd:MD_DigitalTransferOptions/" +
+        "gmd:onLine/" +
+        "gmd:CI_OnlineResource")
 
-            resource_no = 0
-            for resource in record_resources:
-                resource_no += 1
+    resource_no = 0
+    for resource in record_resources:
+        resource_no += 1
 
-                json_record_resource = {}
-                json_record_resource[schema_ref["66"]['CKAN API property']] = {}
+        json_record_resource = {}
+        json_record_resource[schema_ref["66"]['CKAN API property']] = {}
 
 # CC::OpenMaps-66 Title (English)
 
-                value = fetch_FGP_value(resource, HNAP_fileIdentifier, schema_ref["66"])
-                if value:
-                    json_record_resource[schema_ref["66"]['CKAN API property']][CKAN_primary_lang] = value
+        value = fetch_FGP_value(resource, HNAP_fileIdentifier, schema_ref["66"])
+        if value:
+            json_record_resource[schema_ref["66"]['CKAN API property']][CKAN_primary_lang] = value
 
 # CC::OpenMaps-67 Title (English)
 
-                value = fetch_FGP_value(resource, HNAP_fileIdentifier, schema_ref["67"])
-                if value:
-                    json_record_resource[schema_ref["66"]['CKAN API property']][CKAN_secondary_lang] = value
+        value = fetch_FGP_value(resource, HNAP_fileIdentifier, schema_ref["67"])
+        if value:
+            json_record_resource[schema_ref["66"]['CKAN API property']][CKAN_secondary_lang] = value
 
 # CC::OpenMaps-69 Resource Type
 # CC::OpenMaps-70 Format
 # CC::OpenMaps-73 Language
 
-                value = fetch_FGP_value(resource, HNAP_fileIdentifier, schema_ref["69-70-73"])
-                if value:
-                    description_text = value.strip()
+        value = fetch_FGP_value(resource, HNAP_fileIdentifier, schema_ref["69-70-73"])
+        if value:
+            description_text = value.strip()
 
-                    if description_text.count(';') != 2:
-                        reportError(
-                            HNAP_fileIdentifier,[
-                                schema_ref["69-70-73"]['CKAN API property'],
-                                'Content, Format or Language missing, must be: contentType;format;lang,lang',
-                                description_text
-                            ])
-                    else:
-                        (res_contentType, res_format,
-                         res_language) = description_text.split(';')
-
-                        languages_in = res_language.strip().split(',')
-                        languages_out = []
-                        for language in languages_in:
-                            if language.strip() == 'eng':
-                                languages_out.append('en')
-                            if language.strip() == 'fra':
-                                languages_out.append('fr')
-                            if language.strip() == 'zxx': # Non linguistic
-                                languages_out.append('zxx')
-                        # language_str = ','.join(languages_out)
-                        language_str = []
-                        for langStr in languages_out:
-                            language_str.append(langStr)
-
-                        json_record_resource[schema_ref["69"]['CKAN API property']] = res_contentType.strip().lower()
-                        json_record_resource[schema_ref["70"]['CKAN API property']] = res_format.strip()
-                        json_record_resource[schema_ref["73"]['CKAN API property']] = language_str
-
-                        #XXX Super duper hack
-                        if json_record_resource[schema_ref["69"]['CKAN API property']] == 'supporting document':
-                            json_record_resource[schema_ref["69"]['CKAN API property']] = 'guide'
-                        if json_record_resource[schema_ref["69"]['CKAN API property']] == 'Supporting Documents':
-                            json_record_resource[schema_ref["69"]['CKAN API property']] = 'guide'
-                        if json_record_resource[schema_ref["69"]['CKAN API property']] == 'Supporting Document':
-                            json_record_resource[schema_ref["69"]['CKAN API property']] = 'guide'
-                        if json_record_resource[schema_ref["69"]['CKAN API property']] == 'web service':
-                            json_record_resource[schema_ref["69"]['CKAN API property']] = 'web_service'
-                        if json_record_resource[schema_ref["69"]['CKAN API property']] == 'données':
-                            json_record_resource[schema_ref["69"]['CKAN API property']] = 'dataset'
-
-                        if json_record_resource[schema_ref["70"]['CKAN API property']] == 'Web App':
-                            json_record_resource[schema_ref["70"]['CKAN API property']] = 'HTML'
-                        if json_record_resource[schema_ref["70"]['CKAN API property']] == 'IOS Application':
-                            json_record_resource[schema_ref["70"]['CKAN API property']] = 'IPA'
-                        if json_record_resource[schema_ref["70"]['CKAN API property']] == 'Blackberry Application':
-                            json_record_resource[schema_ref["70"]['CKAN API property']] = 'COD'
-                        if json_record_resource[schema_ref["70"]['CKAN API property']] == 'Windows Mobile':
-                            json_record_resource[schema_ref["70"]['CKAN API property']] = 'EXE'
-                        if json_record_resource[schema_ref["70"]['CKAN API property']] == 'Android Application':
-                            json_record_resource[schema_ref["70"]['CKAN API property']] = 'APK'
-
-                else:
-                    reportError(
-                        HNAP_fileIdentifier,[
-                            schema_ref["69-70-73"]['CKAN API property'],
-                            'format,mandatory field missing'
-                        ])
-                    reportError(
-                        HNAP_fileIdentifier,[
-                            schema_ref["69-70-73"]['CKAN API property'],
-                            'language,mandatory field missing'
-                        ])
-                    reportError(
-                        HNAP_fileIdentifier,[
-                            schema_ref["69-70-73"]['CKAN API property'],
-                            'contentType,mandatory field missing'
-                        ])
+            if description_text.count(';') != 2:
+                reportError(
+                    HNAP_fileIdentifier,[
+                        schema_ref["69-70-73"]['CKAN API property'],
+                        'Content, Format or Language missing, must be: contentType;format;lang,lang',
+                        description_text
+                    ])
+            else:
+                (res_contentType, res_format,
+                 res_language) = description_text.split(';')
+
+                languages_in = res_language.strip().split(',')
+                languages_out = []
+                for language in languages_in:
+                    if language.strip() == 'eng':
+                        languages_out.append('en')
+                    if language.strip() == 'fra':
+                        languages_out.append('fr')
+                    if language.strip() == 'zxx': # Non linguistic
+                        languages_out.append('zxx')
+                # language_str = ','.join(languages_out)
+                language_str = []
+                for langStr in languages_out:
+                    language_str.append(langStr)
+
+                json_record_resource[schema_ref["69"]['CKAN API property']] = res_contentType.strip().lower()
+                json_record_resource[schema_ref["70"]['CKAN API property']] = res_format.strip()
+                json_record_resource[schema_ref["73"]['CKAN API property']] = language_str
+
+                #XXX Super duper hack
+                if json_record_resource[schema_ref["69"]['CKAN API property']] == 'supporting document':
+                    json_record_resource[schema_ref["69"]['CKAN API property']] = 'guide'
+                if json_record_resource[schema_ref["69"]['CKAN API property']] == 'Supporting Documents':
+                    json_record_resource[schema_ref["69"]['CKAN API property']] = 'guide'
+                if json_record_resource[schema_ref["69"]['CKAN API property']] == 'Supporting Document':
+                    json_record_resource[schema_ref["69"]['CKAN API property']] = 'guide'
+                if json_record_resource[schema_ref["69"]['CKAN API property']] == 'web service':
+                    json_record_resource[schema_ref["69"]['CKAN API property']] = 'web_service'
+                if json_record_resource[schema_ref["69"]['CKAN API property']] == 'données':
+                    json_record_resource[schema_ref["69"]['CKAN API property']] = 'dataset'
+
+                if json_record_resource[schema_ref["70"]['CKAN API property']] == 'Web App':
+                    json_record_resource[schema_ref["70"]['CKAN API property']] = 'HTML'
+                if json_record_resource[schema_ref["70"]['CKAN API property']] == 'IOS Application':
+                    json_record_resource[schema_ref["70"]['CKAN API property']] = 'IPA'
+                if json_record_resource[schema_ref["70"]['CKAN API property']] == 'Blackberry Application':
+                    json_record_resource[schema_ref["70"]['CKAN API property']] = 'COD'
+                if json_record_resource[schema_ref["70"]['CKAN API property']] == 'Windows Mobile':
+                    json_record_resource[schema_ref["70"]['CKAN API property']] = 'EXE'
+                if json_record_resource[schema_ref["70"]['CKAN API property']] == 'Android Application':
+                    json_record_resource[schema_ref["70"]['CKAN API property']] = 'APK'
 
-                if json_record_resource[schema_ref["69"]['CKAN API property']].lower() not in ResourceType:
-                    reportError(
-                        HNAP_fileIdentifier,[
-                            schema_ref["69-70-73"]['CKAN API property'],
-                            'invalid resource type',
-                            json_record_resource[schema_ref["69"]['CKAN API property']]
-                        ])
-                else:
-                    json_record_resource[schema_ref["69"]['CKAN API property']] = ResourceType[json_record_resource[schema_ref["69"]['CKAN API property']].lower()][0]
+        else:
+            reportError(
+                HNAP_fileIdentifier,[
+                    schema_ref["69-70-73"]['CKAN API property'],
+                    'format,mandatory field missing'
+                ])
+            reportError(
+                HNAP_fileIdentifier,[
+                    schema_ref["69-70-73"]['CKAN API property'],
+                    'language,mandatory field missing'
+                ])
+            reportError(
+                HNAP_fileIdentifier,[
+                    schema_ref["69-70-73"]['CKAN API property'],
+                    'contentType,mandatory field missing'
+                ])
+
+        if json_record_resource[schema_ref["69"]['CKAN API property']].lower() not in ResourceType:
+            reportError(
+                HNAP_fileIdentifier,[
+                    schema_ref["69-70-73"]['CKAN API property'],
+                    'invalid resource type',
+                    json_record_resource[schema_ref["69"]['CKAN API property']]
+                ])
+        else:
+            json_record_resource[schema_ref["69"]['CKAN API property']] = ResourceType[json_record_resource[schema_ref["69"]['CKAN API property']].lower()][0]
 
-                if json_record_resource[schema_ref["70"]['CKAN API property']] not in CL_Formats:
-                    reportError(
-                        HNAP_fileIdentifier,[
-                            schema_ref["69-70-73"]['CKAN API property'],
-                            'invalid resource format',
-                            json_record_resource[schema_ref["70"]['CKAN API property']]
-                        ])
+        if json_record_resource[schema_ref["70"]['CKAN API property']] not in CL_Formats:
+            reportError(
+                HNAP_fileIdentifier,[
+                    schema_ref["69-70-73"]['CKAN API property'],
+                    'invalid resource format',
+                    json_record_resource[schema_ref["70"]['CKAN API property']]
+                ])
 
 # CC::OpenMaps-71 Character Set
 # TBS 2016-04-13: Not in HNAP, we can skip
@@ -1459,15 +1897,15 @@ def main():
 
 # CC::OpenMaps-74 Download URL
 
-                value = fetch_FGP_value(resource, HNAP_fileIdentifier, schema_ref["74"])
-                if value:
-                    json_record_resource[schema_ref["74"]['CKAN API property']] = value
-                else:
-                    reportError(
-                        HNAP_fileIdentifier,[
-                            schema_ref["74"]['CKAN API property'],
-                            'URL, mandatory field missing'
-                        ])
+        value = fetch_FGP_value(resource, HNAP_fileIdentifier, schema_ref["74"])
+        if value:
+            json_record_resource[schema_ref["74"]['CKAN API property']] = value
+        else:
+            reportError(
+                HNAP_fileIdentifier,[
+                    schema_ref["74"]['CKAN API property'],
+                    'URL, mandatory field missing'
+                ])
 
 
 # CC::OpenMaps-75 Title (English)
@@ -1496,94 +1934,301 @@ def main():
 # CC::OpenMaps-81 Mappable
 # Stored as a generic Display Flag in preperation for other forms of visualizations
 
-                #if schema_ref["81"]['CKAN API property'] not in json_record:
-                #    can_be_used_in_RAMP = False
-                #    json_record[schema_ref["81"]['CKAN API property']] = can_be_used_in_RAMP
-
-                # If false check if true now
-                if not can_be_used_in_RAMP:
-                    value = fetch_FGP_value(resource, HNAP_fileIdentifier, schema_ref["81"])
-                    if value:
-                        protocol_desc = value.strip()
-                        if protocol_desc in mappable_protocols:
-                            can_be_used_in_RAMP = True
-
-                # Append the resource to the Open Maps record
-                json_record['resources'].append(json_record_resource)
-
-            #json_record[schema_ref["81"]['CKAN API property']] = can_be_used_in_RAMP
-            view_on_map = ""
-            if can_be_used_in_RAMP:
-                json_record['display_flags'].append('fgp_viewer')
-                view_on_map = " [ View on Map ]"
-                num_view_on_map += 1
-
-
-            ##################################################
-            #                                                #
-            # Accept or Reject                               #
-            # Assume IMSO approval                           #
-            # Assume publish status                          #
-            # Assume active status                           #
-            # Append to list of Datasets                     #
-            #                                                #
-            ##################################################
-
-            if HNAP_fileIdentifier in error_records:
+        #if schema_ref["81"]['CKAN API property'] not in json_record:
+        #    can_be_used_in_RAMP = False
+        #    json_record[schema_ref["81"]['CKAN API property']] = can_be_used_in_RAMP
+
+        # If false check if true now
+        if not can_be_used_in_RAMP:
+            value = fetch_FGP_value(resource, HNAP_fileIdentifier, schema_ref["81"])
+            if value:
+                protocol_desc = value.strip()
+                if protocol_desc in mappable_protocols:
+                    can_be_used_in_RAMP = True
+
+        # Append the resource to the Open Maps record
+        json_record['resources'].append(json_record_resource)
+
+    #json_record[schema_ref["81"]['CKAN API property']] = can_be_used_in_RAMP
+    if can_be_used_in_RAMP:
+        json_record['display_flags'].append('fgp_viewer')
+
+    return HNAP_fileIdentifier, json_record, can_be_used_in_RAMP
+
+
+# Accept or reject every record, in order, converted on as many workers as
+# asked for.  Accepted records and every record's error rows go to output
+# as soon as it's finished.  A record with no primary language or ID ends
+# its block, the rest of its CSW response.  Returns how many records were
+# accepted, how many rejected and how many can be viewed on a map.
+def convertRecords(records, output, quiet=False, workers=0):
+    num_accepted = 0
+    num_rejects = 0
+    num_view_on_map = 0
+    skipped_block = None
+    # Converted ahead on workers, merged here in order.  What they
+    # converted past the point of no return is dropped, errors and all.
+    convert = convertRecordLine
+    if workers:
+        records = convertInPool(records, workers)
+        convert = mergeConversion
+    for block, record in records:
+        # The rest of a block given up on
+        if block == skipped_block:
+            continue
+        converted = convert(record)
+        output.writeErrors(error_output)
+        del error_output[:]
+        # Point of no return, no primary language or ID
+        if converted is None:
+            skipped_block = block
+            continue
+        HNAP_fileIdentifier, json_line, can_be_used_in_RAMP = converted
+
+        view_on_map = ""
+        if can_be_used_in_RAMP:
+            view_on_map = " [ View on Map ]"
+            num_view_on_map += 1
+
+
+        ##################################################
+        #                                                #
+        # Accept or Reject                               #
+        # Assume IMSO approval                           #
+        # Assume publish status                          #
+        # Assume active status                           #
+        # Append to list of Datasets                     #
+        #                                                #
+        ##################################################
+
+        if HNAP_fileIdentifier in error_records:
+            if not quiet:
                 print "\x1b[0;37;41m Reject: \x1b[0m "+str(HNAP_fileIdentifier) + view_on_map
-                num_rejects += 1
-            else:
+            num_rejects += 1
+        else:
+            if not quiet:
                 print "\x1b[0;37;42m Accept: \x1b[0m "+str(HNAP_fileIdentifier) + view_on_map
-                json_record['imso_approval'] = 'true'
-                json_record['ready_to_publish'] = 'true'
-                json_record['state'] = 'active'
-                json_record['restrictions'] = 'unrestricted'
-                # if error don't do this
-                json_records.append(json_record)
-
-            ##################################################
-            #                                                #
-            # Move onto the next record                      #
-            #                                                #
-            ##################################################
-
-    if len(json_records) > 0:
-        print ""
-        print "Generating Common Core JSON file for import to CKAN...",
-
-    # Write JSON Lines to files
-    output = codecs.open(output_jl, 'w', 'utf-8')
-    for json_record in json_records:
-        utf_8_output =\
-        json.dumps(
-            json_record,
-            #sort_keys=True,
-            #indent=4,
-            ensure_ascii=False,
-            encoding='utf8')
-        #print utf_8_output
-        output.write(utf_8_output+"\n")
-    output.close()
+            # if error don't do this
+            output.write(HNAP_fileIdentifier, json_line)
+            num_accepted += 1
+
+        ##################################################
+        #                                                #
+        # Move onto the next record                      #
+        #                                                #
+        ##################################################
+
+    return num_accepted, num_rejects, num_view_on_map
+
+
+# convertRecord with the record marked accepted and serialized, on a worker
+# as in a single process, so it's written the same either way.  Only
+# written if it is accepted.
+def convertRecordLine(record):
+    converted = convertRecord(record)
+    if converted is None:
+        return None
+    HNAP_fileIdentifier, json_record, can_be_used_in_RAMP = converted
+    markAccepted(json_record)
+    return HNAP_fileIdentifier, jsonLine(json_record), can_be_used_in_RAMP
+
+
+# Assume IMSO approval, publish and active status
+def markAccepted(json_record):
+    json_record['imso_approval'] = 'true'
+    json_record['ready_to_publish'] = 'true'
+    json_record['state'] = 'active'
+    json_record['restrictions'] = 'unrestricted'
+
+
+def jsonLine(json_record):
+    return json.dumps(
+        json_record,
+        #sort_keys=True,
+        #indent=4,
+        ensure_ascii=False,
+        encoding='utf8')
 
-    if len(json_records) > 0:
-        print "Done!"
-        print ""
-        print "* Number of records accepted: "+str(len(json_records))
-        print ""
-        print "* Number of records rejected: "+str(num_rejects)
-        print ""
-        print "* Number with view on map:    "+str(num_view_on_map)
-        print ""
-        print "* Number of errors logged:    "+str(len(error_output)) + " [ harvested_record_errors.csv | harvested_record_errors.html ]"
-        print ""
- 
-    output = codecs.open(output_err, 'w', 'utf-8')
-    if len(error_output) > 0:
-        output.write('"id","field","description","value"'+u"\n")
-    for error in error_output:
-        #output.write(unicode(error+"\n", 'utf-8'))
-        output.write(error+u"\n")
-    output.close()
+##################################################
+# Streamed output
+# ConversionOutput
+# LoadedRecords
+
+# Bytes buffered before the output files are written to
+OUTPUT_BUFFER = 1 << 16
+
+
+class ConversionOutput(object):
+    # harvested_records.jl and harvested_record_errors.csv written as the
+    # records are finished, buffered UTF-8, to .tmp files next to them that
+    # close() renames into place.  Downstream stages can start on the .tmp
+    # files while they grow.  With keep the accepted records' lines are
+    # kept by id as well, in loaded, for --verify.
+
+    def __init__(self, output_jl, output_err, keep=False):
+        self.paths = [output_jl, output_err]
+        self.records = open(output_jl + '.tmp', 'wb', OUTPUT_BUFFER)
+        self.errors = open(output_err + '.tmp', 'wb', OUTPUT_BUFFER)
+        self.num_errors = 0
+        self.loaded = LoadedRecords() if keep else None
+
+    def write(self, HNAP_fileIdentifier, json_line):
+        self.records.write(json_line.encode('utf-8') + "\n")
+        if self.loaded is not None:
+            self.loaded.write(HNAP_fileIdentifier, json_line)
+
+    # The header goes before the first row, an empty file when there are
+    # no errors
+    def writeErrors(self, errors):
+        for error in errors:
+            if not self.num_errors:
+                self.errors.write('"id","field","description","value"\n')
+            self.errors.write(error.encode('utf-8') + "\n")
+            self.num_errors += 1
+
+    def close(self):
+        for stream, path in zip([self.records, self.errors], self.paths):
+            stream.close()
+            os.rename(path + '.tmp', path)
+
+    # A failed conversion leaves the last run's output as it was
+    def discard(self):
+        for stream, path in zip([self.records, self.errors], self.paths):
+            stream.close()
+            try:
+                os.remove(path + '.tmp')
+            except OSError:
+                pass
+
+
+class LoadedRecords(dict):
+    # What loading the accepted records in order would leave in CKAN, the
+    # last JSON line of every id.  The errors aren't kept.
+
+    def write(self, HNAP_fileIdentifier, json_line):
+        self[HNAP_fileIdentifier] = json_line
+
+    def writeErrors(self, errors):
+        pass
+
+##################################################
+# Conversion workers
+# convertInPool(records, workers)
+# convertSerialized(record)
+# mergeConversion(conversion)
+
+
+# Every record converted on a pool of forked workers, which start with the
+# schema and controlled lists already loaded.  Results come back as
+# (block, conversion) in input order.  Only a few records per worker are
+# in flight, so the input still streams.
+def convertInPool(records, workers):
+    pool = multiprocessing.Pool(workers)
+    in_flight = collections.deque()
+    try:
+        for block, record in records:
+            in_flight.append((block, pool.apply_async(
+                convertSerialized, (etree.tostring(record),))))
+            if len(in_flight) >= workers * 8:
+                block, conversion = in_flight.popleft()
+                yield block, conversion.get()
+        while in_flight:
+            block, conversion = in_flight.popleft()
+            yield block, conversion.get()
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+# In a worker, convertRecordLine on a serialised record along with the
+# errors it reported, the rows and how many by fileIdentifier
+def convertSerialized(record):
+    del error_output[:]
+    error_records.clear()
+    converted = convertRecordLine(etree.fromstring(record))
+    return converted, list(error_output), dict(error_records)
+
+
+# A worker's conversion as though convertRecordLine had run here, its
+# errors reported in input order
+def mergeConversion(conversion):
+    converted, record_output, record_errors = conversion
+    error_output.extend(record_output)
+    for HNAP_fileIdentifier, errors in record_errors.items():
+        error_records[HNAP_fileIdentifier] = \
+            error_records.get(HNAP_fileIdentifier, 0) + errors
+    return converted
+
+##################################################
+# Last writer wins
+# compactRecords(records)
+# recordKey(record)
+# verifyCompaction(compacted, records, workers)
+
+
+# Loading records into CKAN in order leaves the last version of each, so
+# only the last version of every fileIdentifier is converted, in the order
+# those last versions came in.  Each goes in a block of its own.  Records
+# convertRecord gives up on are all kept, and the rest of their block is
+# dropped as converting everything would.  The records kept are copies,
+# streamRecords clears what it has handed out.
+def compactRecords(records):
+    last_versions = {}
+    position = 0
+    skipped_block = None
+    for block, record in records:
+        if block == skipped_block:
+            continue
+        position += 1
+        key = recordKey(record)
+        if key is None:
+            last_versions[('NOID', position)] = (
+                position, copy.deepcopy(record))
+            skipped_block = block
+            continue
+        last_versions[key] = (position, copy.deepcopy(record))
+    return sorted(last_versions.values())
+
+
+# The fileIdentifier convertRecord will find, None when it won't get past
+# the point of no return
+def recordKey(record):
+    languages = fetchXMLValues(record, schema_ref["12"].xpath)
+    identifiers = fetchXMLValues(record, schema_ref["05"].xpath)
+    if len(set(languages)) > 1 or len(set(identifiers)) > 1:
+        return None
+    return sanityFirst(identifiers)
+
+
+# Converts everything again and compares what loading either would leave in
+# CKAN, the last record of every id, compacted being what the compacted run
+# loaded.  Its errors were written already, who was rejected is put back
+# afterwards.  A record rejected once is rejected for the rest of a run, so
+# a version fixed after a rejected one only loads compacted, that's
+# reported like any other difference.
+def verifyCompaction(compacted, records, workers=0):
+    compacted_errors = dict(error_records)
+    error_records.clear()
+    loaded = LoadedRecords()
+    num_uncompacted = convertRecords(records, loaded, True, workers)[0]
+    error_records.clear()
+    error_records.update(compacted_errors)
+
+    mismatches = []
+    for record_id in sorted(set(compacted) | set(loaded)):
+        if record_id not in compacted:
+            mismatches.append("Only loaded without --compact: " + record_id)
+        elif record_id not in loaded:
+            mismatches.append("Only loaded with --compact: " + record_id)
+        elif compacted[record_id] != loaded[record_id] and\
+                json.loads(compacted[record_id]) !=\
+                json.loads(loaded[record_id]):
+            mismatches.append("Loaded differently: " + record_id)
+    sys.stderr.write("Verified %d records against %d uncompacted, %d "
+                     "differ\n" % (
+                         len(compacted), num_uncompacted, len(mismatches)))
+    return mismatches
 
 ##################################################
 # Reporting, Sanity and Access functions
@@ -1603,9 +2248,8 @@ def reportError(HNAP_fileIdentifier,errorInfo):
     if not isinstance(errorText, unicode):
         errorText = unicode(errorText, 'utf-8')
     error_output.append(errorText)
-    if HNAP_fileIdentifier not in error_records:
-        error_records[HNAP_fileIdentifier] = []
-    error_records[HNAP_fileIdentifier].append(errorText)
+    error_records[HNAP_fileIdentifier] = \
+        error_records.get(HNAP_fileIdentifier, 0) + 1
     #print len(error_output)
 # Sanity check: make sure the value exists
 def sanityMandatory(HNAP_fileIdentifier,errorInfo, values):
@@ -1662,19 +2306,30 @@ def maskDate(date):
 
 ##################################################
 # XML Extract functions
+# compiledXPath(xpath)
 # fetchXMLArray(objectToXpath, xpath)
 # fetchXMLValues(objectToXpath, xpath)
 # fetchXMLAttribute(objectToXpath, xpath, attribute)
 # fetchCLValue(SRCH_key, CL_array)
 
+# XPaths written out in the code, compiled the first time they're used
+xpath_plan = {}
 
-# Fetch an array which may be subsections
+
+def compiledXPath(xpath):
+    compiled = xpath_plan.get(xpath)
+    if compiled is None:
+        compiled = xpath_plan[xpath] = etree.XPath(
+            xpath, namespaces=xpath_namespaces)
+    return compiled
+
+
+# Fetch an array which may be subsections, the xpath either a string or a
+# schema row's compiled one
 def fetchXMLArray(objectToXpath, xpath):
-    return objectToXpath.xpath(xpath, namespaces={
-        'gmd': 'http://www.isotc211.org/2005/gmd',
-        'gco': 'http://www.isotc211.org/2005/gco',
-        'gml': 'http://www.opengis.net/gml/3.2',
-        'csw': 'http://www.opengis.net/cat/csw/2.0.2'})
+    if isinstance(xpath, basestring):
+        xpath = compiledXPath(xpath)
+    return xpath(objectToXpath)
 
 
 # Extract values from your current position
@@ -1699,11 +2354,7 @@ def fetchXMLAttribute(objectToXpath, xpath, attribute):
     # xpath/to/key/@key_attribute
     # e.g.:
     # html/body/@background-color
-    return objectToXpath.xpath(xpath + '/@' + attribute, namespaces={
-        'gmd': 'http://www.isotc211.org/2005/gmd',
-        'gco': 'http://www.isotc211.org/2005/gco',
-        'gml': 'http://www.opengis.net/gml/3.2',
-        'csw': 'http://www.opengis.net/cat/csw/2.0.2'})
+    return fetchXMLArray(objectToXpath, xpath + '/@' + attribute)
 
 
 # Fetch the value of a controled list ( at the bottom )
@@ -1725,12 +2376,10 @@ def fetch_FGP_value(record, HNAP_fileIdentifier, schema_ref):
     if schema_ref['Value Type'] == 'value':
         tmp = fetchXMLValues(
             record,
-            schema_ref["FGP XPATH"])
+            schema_ref.xpath)
     elif schema_ref['Value Type'] == 'attribute':
-        tmp = fetchXMLAttribute(
-            record,
-            schema_ref["FGP XPATH"],
-            "codeListValue")
+        # Compiled with its /@codeListValue
+        tmp = schema_ref.xpath(record)
     else:
         reportError(
             HNAP_fileIdentifier, [